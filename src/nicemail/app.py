@@ -41,7 +41,8 @@ def main(argv: list[str] | None = None) -> int:
     config_loader = ConfigLoader()
     config: AppConfig = config_loader.load(args.config)
 
-    background_tasks = BackgroundTaskRunner()
+    # One worker per account for the parallel inbox sync, plus headroom for UI tasks.
+    background_tasks = BackgroundTaskRunner(max_workers=max(4, len(config.accounts) + 2))
     controller = MailController(config=config, background_runner=background_tasks)
     window = MainWindow(controller=controller, use_sample_data=not args.no_sample_data)
 
@@ -52,7 +53,8 @@ def main(argv: list[str] | None = None) -> int:
 
     window.show()
     exit_code = app.exec()
-    background_tasks.shutdown()
+    # Stops push and drains background_tasks before the stores close.
+    controller.shutdown()
     return exit_code
 
 
@@ -0,0 +1,344 @@
+"""Asyncio IMAP connections, so many accounts can sync on a single thread."""
+from __future__ import annotations
+
+import asyncio
+import re
+import ssl
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+from .config import MailAccountConfig
+
+ResponseEntry = bytes | tuple[bytes, bytes]
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\+?\}$")
+_CODE_RE = re.compile(rb"^\[([A-Z-]+)(?: ([^\]]*))?\]")
+
+
+class AsyncImapError(Exception):
+    """The server refused a command or the connection broke."""
+
+
+@dataclass(slots=True)
+class ImapReply:
+    """Tagged completion of one command plus the untagged responses seen while it ran.
+
+    Untagged data is kept in the shape :mod:`imaplib` uses (``bytes`` lines and
+    ``(prefix, literal)`` tuples), so :func:`~nicemail.core.imap_response.parse_fetch_response`
+    works on it unchanged. While commands are pipelined their untagged
+    responses interleave, so each reply sees everything that arrived while it
+    was outstanding.
+    """
+
+    status: str
+    text: bytes
+    untagged: list[tuple[str, list[ResponseEntry]]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "OK"
+
+    def data(self, kind: str) -> list[ResponseEntry]:
+        entries: list[ResponseEntry] = []
+        for name, parts in self.untagged:
+            if name == kind:
+                entries.extend(parts)
+        return entries
+
+    def search_uids(self) -> list[int]:
+        """UIDs of a ``UID SEARCH`` reply, ascending."""
+        return sorted(int(uid) for value in self.data("SEARCH") if isinstance(value, bytes) for uid in value.split())
+
+    def code(self, name: str) -> int:
+        """Numeric value of a response code such as ``[UIDNEXT 42]``, or 0."""
+        for kind, parts in self.untagged:
+            if kind != "OK" or not parts or not isinstance(parts[0], bytes):
+                continue
+            match = _CODE_RE.match(parts[0])
+            if match and match.group(1).decode("ascii") == name and match.group(2):
+                try:
+                    return int(match.group(2).split()[0])
+                except ValueError:
+                    continue
+        return 0
+
+
+class AsyncImapConnection:
+    """One IMAP session driven by an asyncio stream.
+
+    A reader task matches tagged completions to waiting commands, so several
+    commands can be written back to back (pipelined) and awaited together.
+    Commands are plain strings; arguments must already be IMAP-quoted.
+
+    A command not completed within ``timeout`` seconds aborts the whole
+    session, failing every outstanding command, so a silent server cannot
+    hold the connection lock forever.
+    """
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float | None = None
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+        self.timeout = timeout
+        self._counter = 0
+        self._pending: dict[bytes, tuple[asyncio.Future, list]] = {}
+        # Resolved by the next "+" continuation; set whenever a response arrives.
+        self._continuation: asyncio.Future | None = None
+        self._activity = asyncio.Event()
+        self._reader_task: asyncio.Task | None = None
+        self.capabilities: frozenset[str] = frozenset()
+        self.enabled: frozenset[str] = frozenset()
+        self.mailbox: str | None = None
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(
+        cls, account: MailAccountConfig, timeout: float = 30.0, command_timeout: float | None = None
+    ) -> AsyncImapConnection:
+        """Connect, log in and enable CONDSTORE/QRESYNC when the server offers them."""
+        context = ssl.create_default_context() if account.use_ssl else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(account.incoming_server, account.port, ssl=context), timeout
+        )
+        conn = cls(reader, writer, command_timeout)
+        try:
+            greeting = await asyncio.wait_for(reader.readline(), timeout)
+            if not greeting.startswith((b"* OK", b"* PREAUTH")):
+                raise AsyncImapError(f"unexpected greeting {greeting[:80]!r}")
+            conn._reader_task = asyncio.get_running_loop().create_task(conn._read_loop())
+            username = account.username or account.address
+            reply = await asyncio.wait_for(
+                conn.command(f"LOGIN {quote(username)} {quote(account.password or '')}"), timeout
+            )
+            if not reply.ok:
+                raise AsyncImapError(f"login failed: {reply.text.decode('utf8', 'replace')}")
+            await asyncio.wait_for(conn._enable_extensions(), timeout)
+        except BaseException:
+            conn.abort()
+            raise
+        return conn
+
+    @property
+    def is_open(self) -> bool:
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def command(self, line: str) -> ImapReply:
+        _tag, future, untagged = self._send(line)
+        try:
+            status, text = await asyncio.wait_for(self._complete(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.abort()
+            raise AsyncImapError(f"no reply to {line.split(' ', 1)[0]} within {self.timeout:g}s") from None
+        return ImapReply(status=status, text=text, untagged=untagged)
+
+    async def idle(self, duration: float) -> bool:
+        """Hold one ``IDLE`` for up to ``duration`` seconds; True when the server announced new mail.
+
+        Returns early on the first ``EXISTS``. Only the server's go-ahead and
+        the reply to ``DONE`` are bound by :attr:`timeout`. A caller cancelled
+        mid-IDLE must :meth:`abort` the session.
+        """
+        loop = asyncio.get_running_loop()
+        self._continuation = continuation = loop.create_future()
+        _tag, done, untagged = self._send("IDLE")
+        try:
+            started, _ = await asyncio.wait(
+                {continuation, done}, timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if continuation not in started:
+                if done not in started:
+                    done.cancel()
+                    self.abort()
+                    raise AsyncImapError("no reply to IDLE")
+                status, text = done.result()
+                raise AsyncImapError(f"IDLE refused: {status} {text.decode('utf8', 'replace')}")
+
+            deadline = loop.time() + duration
+            while not done.done() and not _announces_new_mail(untagged):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._activity.clear()
+                try:
+                    await asyncio.wait_for(self._activity.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if not done.done():
+                self._writer.write(b"DONE\r\n")
+                try:
+                    await asyncio.wait_for(self._complete(done), self.timeout)
+                except asyncio.TimeoutError:
+                    self.abort()
+                    raise AsyncImapError("no reply to IDLE DONE") from None
+            done.result()
+            return _announces_new_mail(untagged)
+        finally:
+            self._continuation = None
+            if not done.done():
+                # Cancelled mid-IDLE: nobody will collect the reply, or the error abort() sets.
+                done.cancel()
+
+    async def pipeline(self, lines: Iterable[str]) -> list[ImapReply]:
+        """Send all ``lines`` without waiting in between, then await every reply."""
+        return list(await asyncio.gather(*(self.command(line) for line in lines)))
+
+    async def select(self, mailbox: str, readonly: bool = False) -> ImapReply:
+        reply = await self.command(f"{'EXAMINE' if readonly else 'SELECT'} {quote(mailbox)}")
+        self.mailbox = mailbox if reply.ok else None
+        return reply
+
+    async def logout(self) -> None:
+        try:
+            await asyncio.wait_for(self.command("LOGOUT"), 5.0)
+        except (AsyncImapError, OSError, asyncio.TimeoutError):
+            pass
+        self.abort()
+
+    def abort(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        self._writer.close()
+        self._fail_pending(AsyncImapError("connection closed"))
+
+    # ------------------------------ internals ------------------------------
+    def _send(self, line: str) -> tuple[bytes, asyncio.Future, list[tuple[str, list[ResponseEntry]]]]:
+        """Write ``line`` under a new tag; returns the tag, its completion future and untagged sink."""
+        if not self.is_open:
+            raise AsyncImapError("connection is closed")
+        self._counter += 1
+        tag = f"NM{self._counter}".encode("ascii")
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        untagged: list[tuple[str, list[ResponseEntry]]] = []
+        self._pending[tag] = (future, untagged)
+        self._writer.write(tag + b" " + line.encode("utf8") + b"\r\n")
+        return tag, future, untagged
+
+    async def _complete(self, future: asyncio.Future) -> tuple[str, bytes]:
+        await self._writer.drain()
+        return await future
+
+    async def _enable_extensions(self) -> None:
+        reply = await self.command("CAPABILITY")
+        for parts in (parts for kind, parts in reply.untagged if kind == "CAPABILITY"):
+            self.capabilities = frozenset(parts[0].decode("ascii", "replace").upper().split())
+        if "ENABLE" not in self.capabilities:
+            return
+        for extension, implied in (("QRESYNC", {"QRESYNC", "CONDSTORE"}), ("CONDSTORE", {"CONDSTORE"})):
+            if extension in self.capabilities and (await self.command(f"ENABLE {extension}")).ok:
+                self.enabled = frozenset(implied)
+                return
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                parts = await self._read_response()
+                self._activity.set()
+                head = parts[0][0] if isinstance(parts[0], tuple) else parts[0]
+                if head.startswith(b"* "):
+                    untagged = _split_untagged(parts)
+                    for _future, sink in self._pending.values():
+                        sink.append(untagged)
+                elif head.startswith(b"+"):
+                    if self._continuation is not None and not self._continuation.done():
+                        self._continuation.set_result(None)
+                else:
+                    tag, _, rest = head.partition(b" ")
+                    status, _, text = rest.partition(b" ")
+                    waiting = self._pending.pop(tag, None)
+                    if waiting is not None and not waiting[0].done():
+                        waiting[0].set_result((status.decode("ascii", "replace").upper(), text))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._fail_pending(AsyncImapError(f"connection lost: {exc}"))
+
+    async def _read_response(self) -> list[ResponseEntry]:
+        """Read one response, including any ``{n}`` literals it carries."""
+        parts: list[ResponseEntry] = []
+        line = await self._reader.readline()
+        while True:
+            if not line:
+                raise AsyncImapError("server closed the connection")
+            line = line.rstrip(b"\r\n")
+            literal = _LITERAL_RE.search(line)
+            if literal is None:
+                parts.append(line)
+                return parts
+            parts.append((line, await self._reader.readexactly(int(literal.group(1)))))
+            line = await self._reader.readline()
+
+    def _fail_pending(self, error: Exception) -> None:
+        self._activity.set()
+        pending, self._pending = self._pending, {}
+        for future, _sink in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class AsyncImapEngine:
+    """Keep one :class:`AsyncImapConnection` per account on the event loop.
+
+    Every method must run on the loop thread. Commands for one account are
+    serialised through the connection's lock (the selected mailbox is
+    connection state); different accounts proceed concurrently. A command
+    that outlives ``command_timeout`` closes its connection, and the next
+    call for that account opens a new one.
+    """
+
+    def __init__(self, connect_timeout: float = 30.0, command_timeout: float | None = None) -> None:
+        self._connect_timeout = connect_timeout
+        self._command_timeout = command_timeout
+        self._connections: dict[str, AsyncImapConnection] = {}
+        self._connecting: dict[str, asyncio.Lock] = {}
+
+    async def connection(self, account: MailAccountConfig) -> AsyncImapConnection:
+        lock = self._connecting.setdefault(account.key, asyncio.Lock())
+        async with lock:
+            conn = self._connections.get(account.key)
+            if conn is None or not conn.is_open:
+                conn = await AsyncImapConnection.connect(account, self._connect_timeout, self._command_timeout)
+                self._connections[account.key] = conn
+            return conn
+
+    async def open(self, account: MailAccountConfig) -> AsyncImapConnection:
+        """A new connection for ``account`` that is not shared; the caller closes it (e.g. for IDLE)."""
+        return await AsyncImapConnection.connect(account, self._connect_timeout, self._command_timeout)
+
+    def discard(self, account: MailAccountConfig) -> None:
+        conn = self._connections.pop(account.key, None)
+        if conn is not None:
+            conn.abort()
+
+    async def close(self) -> None:
+        connections, self._connections = list(self._connections.values()), {}
+        await asyncio.gather(*(conn.logout() for conn in connections), return_exceptions=True)
+
+
+# ------------------------------ helpers --------------------------------
+def quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _announces_new_mail(untagged: Sequence[tuple[str, list[ResponseEntry]]]) -> bool:
+    return any(kind == "EXISTS" for kind, _parts in untagged)
+
+
+def _split_untagged(parts: Sequence[ResponseEntry]) -> tuple[str, list[ResponseEntry]]:
+    """Turn ``* 12 FETCH (...`` into ``("FETCH", [b"12 (...", ...])`` as imaplib would."""
+    first = parts[0]
+    prefix, literal = first if isinstance(first, tuple) else (first, None)
+    words = prefix[2:].split(b" ", 2)
+    if words[0].isdigit() and len(words) > 1:
+        kind = words[1].decode("ascii", "replace").upper()
+        head = words[0] + (b" " + words[2] if len(words) > 2 else b"")
+        if kind != "FETCH":
+            head = words[0]
+    else:
+        kind = words[0].decode("ascii", "replace").upper()
+        head = b" ".join(words[1:])
+    rest = list(parts[1:])
+    return kind, [(head, literal) if literal is not None else head, *rest]
+
+
+__all__ = ["AsyncImapConnection", "AsyncImapEngine", "AsyncImapError", "ImapReply", "quote"]
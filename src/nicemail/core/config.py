@@ -8,13 +8,22 @@ from typing import List, Optional
 import tomllib
 
 
+DEFAULT_ACCOUNT_TIMEOUT = 20.0
+
+
 def _default_cache_dir() -> Path:
     return Path.home() / ".config" / "nicemail"
 
 
 @dataclass(slots=True)
 class MailAccountConfig:
-    """Describe how to connect to a mailbox."""
+    """Describe how to connect to a mailbox.
+
+    ``id`` names the account in the cache: message ids, stored rows, sync
+    state and connections are keyed by :attr:`key`. It may be left out
+    while the address is unique; :class:`AppConfig` fills it in for accounts
+    that share an address.
+    """
 
     name: str
     address: str
@@ -24,6 +33,13 @@ class MailAccountConfig:
     username: Optional[str] = None
     password: Optional[str] = None
     use_ssl: bool = True
+    fetch_chunk_size: int = 50
+    id: str = ""
+
+    @property
+    def key(self) -> str:
+        """Stable identifier of this account, distinct for every configured account."""
+        return self.id or self.address
 
 
 @dataclass(slots=True)
@@ -33,8 +49,30 @@ class SpamConfig:
     provider: str = "chatgpt"
     api_key: Optional[str] = None
     model: str = "gpt-4o-mini"
+    base_url: Optional[str] = None
     threshold: float = 0.6
     enabled: bool = True
+    cache_ttl_days: float = 30.0
+    cache_max_entries: int = 20000
+    local_margin: float = 0.3
+    local_min_examples: int = 50
+    reputation_min_messages: int = 3
+    move_to_junk: bool = True
+    move_min_confidence: float = 0.8
+    http2: bool = True
+    max_connections: int = 4
+    max_keepalive_connections: int = 2
+    keepalive_expiry: float = 60.0
+    connect_timeout: float = 5.0
+    request_timeout: float = 15.0
+    batch_token_budget: int = 4000
+    max_concurrent_requests: int = 2
+    requests_per_minute: float = 60.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    breaker_failures: int = 3
+    breaker_reset: float = 120.0
 
 
 @dataclass(slots=True)
@@ -44,11 +82,40 @@ class AppConfig:
     accounts: List[MailAccountConfig] = field(default_factory=list)
     spam: SpamConfig = field(default_factory=SpamConfig)
     cache_dir: Path = field(default_factory=_default_cache_dir)
+    account_timeout: float = DEFAULT_ACCOUNT_TIMEOUT
+    # Do all IMAP work on one shared asyncio loop, one session per account plus IDLE, instead of worker threads.
+    async_imap: bool = True
+
+    def __post_init__(self) -> None:
+        _assign_account_ids(self.accounts)
 
     def has_accounts(self) -> bool:
         return bool(self.accounts)
 
 
+def _assign_account_ids(accounts: List[MailAccountConfig]) -> None:
+    """Give accounts that share an address an ``id`` of their own.
+
+    The first account with an address keeps the address as its key, so an
+    existing cache stays valid; later ones become ``address#2``, ``address#3``
+    and so on in config order. Set ``id`` explicitly to keep a key when
+    reordering such accounts.
+    """
+    taken = {account.id for account in accounts if account.id}
+    if len(taken) < sum(1 for account in accounts if account.id):
+        raise ValueError("account ids must be unique")
+    for account in accounts:
+        if account.id:
+            continue
+        key, suffix = account.address, 1
+        while key in taken:
+            suffix += 1
+            key = f"{account.address}#{suffix}"
+        if suffix > 1:
+            account.id = key
+        taken.add(key)
+
+
 class ConfigLoader:
     """Load application configuration from disk."""
 
@@ -73,7 +140,14 @@ class ConfigLoader:
         spam_data = data.get("spam", {})
         spam = SpamConfig(**spam_data)
         cache_dir = Path(data.get("cache_dir")) if data.get("cache_dir") else _default_cache_dir()
-        return AppConfig(accounts=accounts, spam=spam, cache_dir=cache_dir)
+        account_timeout = float(data.get("account_timeout", DEFAULT_ACCOUNT_TIMEOUT))
+        return AppConfig(
+            accounts=accounts,
+            spam=spam,
+            cache_dir=cache_dir,
+            account_timeout=account_timeout,
+            async_imap=bool(data.get("async_imap", True)),
+        )
 
 
 __all__ = [
@@ -1,13 +1,36 @@
 """High level controller connecting UI to services."""
 from __future__ import annotations
 
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from dataclasses import dataclass
-from typing import List, Sequence
+from typing import Awaitable, Callable, Iterable, List, Sequence, TypeVar
 
+from .async_imap import AsyncImapConnection, AsyncImapEngine, AsyncImapError
 from .config import AppConfig, MailAccountConfig
+from .database import Database
+from .idle import AsyncIdleListener, IdleListener
 from .mail_client import MailClient, MailFolder, MailMessage
+from .message_table import MessageTable, StringPool
+from .routing import MessageRegistry
 from .services import BackgroundTaskRunner
+from .spam_assessment import SpamAssessment
 from .spam_manager import SpamManager
+from .store import MessageKey, MessageStore, message_key
+from .sync_state import SyncStateStore
+
+INBOX_LIMIT = 50
+SEARCH_PAGE_SIZE = 50
+# Remote verdicts remembered to reconcile inbox snapshots taken before they arrived.
+SETTLED_LIMIT = 5000
+# How often idle pooled IMAP sessions are reaped or pinged with NOOP.
+KEEPALIVE_INTERVAL = 60.0
+# What a failing session on the asyncio IMAP engine raises.
+_ENGINE_ERRORS = (AsyncImapError, OSError, asyncio.TimeoutError)
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -19,56 +42,249 @@ class InboxData:
     unread_count: int
 
 
+@dataclass
+class SpamUpdate:
+    """Outcome of a background classification round."""
+
+    spam_ids: Sequence[str]
+    cleared_ids: Sequence[str]
+
+
 class MailController:
     """Coordinate the UI with the mail + spam services."""
 
     def __init__(self, config: AppConfig, background_runner: BackgroundTaskRunner) -> None:
         self._config = config
         self._background = background_runner
-        self._clients: List[MailClient] = [MailClient(account) for account in config.accounts]
-        self._spam_manager = SpamManager(config.spam)
+        self._store = MessageStore(Database.open(config.cache_dir / "nicemail.sqlite3"))
+        self._sync_state = SyncStateStore(self._store)
+        self._clients: List[MailClient] = [
+            MailClient(account, sync_state=self._sync_state, store=self._store) for account in config.accounts
+        ]
+        # Message id -> the client it was synced through; misses fall back to the account key.
+        self._routes = MessageRegistry()
+        self._clients_by_key: dict[str, MailClient] = {client.account.key: client for client in self._clients}
+        self._spam_manager = SpamManager(config.spam, database=self._store.database)
+        self._background.add_shutdown_hook(self._spam_manager.close_http)
+        self._imap = AsyncImapEngine(command_timeout=config.account_timeout) if config.async_imap else None
+        if self._imap is not None:
+            self._background.add_shutdown_hook(self._close_async_imap)
+        self._listeners: List[IdleListener | AsyncIdleListener] = []
+        self._refresh_lock = threading.Lock()
+        self._refresh_callbacks: list = []
+        self._refresh_progress: list = []
+        self._classification_lock = threading.Lock()
+        self._classifying: set[str] = set()
+        self._settled: OrderedDict[str, bool] = OrderedDict()
+        self._classification_listener = None
+        # Accounts whose whole inbox history is in the store.
+        self._archive_complete: set[str] = set()
+        # Shared by every page of older mail, so the list can join pages without re-interning.
+        self._strings = StringPool()
+        if any(client.account.protocol.lower() == "imap" and not self._on_engine(client) for client in self._clients):
+            self._background.run_periodically(KEEPALIVE_INTERVAL, self._keep_connections_alive)
 
     @property
     def accounts(self) -> Sequence[MailAccountConfig]:
         return tuple(client.account for client in self._clients)
 
-    def load_initial_inbox(self) -> InboxData:
-        messages: list[MailMessage] = []
-        folders: list[MailFolder] = []
-        for client in self._clients:
-            folders.extend(client.list_primary_folders())
-            inbox_messages = client.fetch_inbox(limit=50)
-            filtered = self._spam_manager.filter_messages(inbox_messages)
-            messages.extend(filtered)
-        unread_count = sum(message.is_unread for message in messages)
-        messages.sort(key=lambda msg: msg.date_received, reverse=True)
-        unique: dict[tuple[str, str], MailFolder] = {}
-        for folder in folders:
-            key = (folder.name, folder.display_name)
-            if key not in unique or folder.is_primary:
-                unique[key] = folder
-        ordered_folders = sorted(unique.values(), key=lambda f: f.sort_index)
-        return InboxData(folders=ordered_folders, messages=messages, unread_count=unread_count)
+    def load_cached_inbox(self) -> InboxData:
+        """Build the inbox from the local store only; no network access."""
+        return self._merge_windows([self._cached_window(client) for client in self._clients])
+
+    def load_initial_inbox(self, on_progress=None) -> InboxData:
+        """Sync all accounts concurrently and merge whatever finished in time.
+
+        Each account gets ``AppConfig.account_timeout`` seconds. Until its
+        sync succeeds, and when it fails or runs out of time, an account is
+        represented by its cached window, so an offline or slow account
+        keeps its rows instead of vanishing from the list (a late sync still
+        completes into the cache). ``on_progress`` gets the merged inbox each
+        time an account finishes.
+        """
+        windows = [self._cached_window(client) for client in self._clients]
+
+        def merge(index: int, result) -> None:
+            if isinstance(result, BaseException):
+                return
+            windows[index] = result
+            if on_progress is not None:
+                on_progress(self._merge_windows(windows))
 
-    def refresh_inbox_async(self, callback) -> None:
-        """Refresh the inbox without blocking the UI."""
+        futures = [self._start_account_load(client) for client in self._clients]
+        self._background.wait_all(futures, timeout=self._config.account_timeout, on_result=merge)
+        return self._merge_windows(windows)
+
+    def refresh_inbox_async(self, callback, on_progress=None) -> None:
+        """Refresh the inbox without blocking the UI.
+
+        Only one refresh runs at a time: callers arriving while one is in
+        flight are attached to it rather than starting a second sync.
+        ``on_progress`` receives partial inbox data on the UI thread as each
+        account finishes; ``callback`` receives the final result.
+        """
+        with self._refresh_lock:
+            self._refresh_callbacks.append(callback)
+            if on_progress is not None:
+                self._refresh_progress.append(on_progress)
+            if len(self._refresh_callbacks) > 1:
+                return
+
+        def report(partial: InboxData) -> None:
+            with self._refresh_lock:
+                listeners = list(self._refresh_progress)
+            for listener in listeners:
+                self._background.post(lambda inbox, listener=listener: listener(self._reconcile_inbox(inbox)), partial)
 
         def task() -> InboxData:
-            return self.load_initial_inbox()
+            return self.load_initial_inbox(on_progress=report)
 
-        self._background.run(task, callback)
+        self._background.run(task, self._finish_refresh)
 
-    def mark_as_read(self, message: MailMessage) -> None:
+    def start_push(self, callback) -> None:
+        """Listen for new mail on every IMAP account.
+
+        ``callback`` receives the newly arrived (spam-filtered) messages of
+        one account at a time, on the UI thread.
+        """
+        if self._listeners:
+            return
+
+        def deliver(result) -> None:
+            callback(result if isinstance(result, Exception) else self._reconcile(result))
         for client in self._clients:
-            if client.owns_message(message):
-                client.mark_as_read(message)
-                break
+            if client.account.protocol.lower() != "imap":
+                continue
+
+            def on_new_mail(uids, client=client) -> None:
+                if self._on_engine(client):
+                    self._background.run_async(self._fetch_new_messages_async(client, uids), deliver)
+                else:
+                    self._background.run(lambda: self._fetch_new_messages(client, uids), deliver)
+
+            if self._imap is not None:
+                listener = AsyncIdleListener(self._imap, client.account, on_new_mail)
+                listener.start(self._background.run_async)
+            else:
+                listener = IdleListener(client.account, on_new_mail)
+                listener.start()
+            self._listeners.append(listener)
+
+    def set_classification_listener(self, callback) -> None:
+        """Receive a :class:`SpamUpdate` on the UI thread whenever pending messages are classified.
+
+        Messages are shown before the remote spam check finishes, with
+        ``spam_pending`` set; the update says which of them to hide.
+        """
+        self._classification_listener = callback
+
+    def load_older_messages(self, before: MessageKey, limit: int = INBOX_LIMIT) -> MessageTable:
+        """Return up to ``limit`` inbox messages older than ``before``, newest first.
+
+        Pages come from the local store as :class:`MessageTable` objects
+        sharing one string pool, so the list can join them and keep years of
+        mail compactly. When the store runs short, the account whose cached
+        history ends most recently downloads older mail first, so accounts
+        stay interleaved by date. Raises :class:`ConnectionError` when nothing could be loaded
+        because a server was unreachable.
+        """
+        clients = self._archive_clients()
+        accounts = [client.account.key for client in clients]
+        while accounts:
+            horizon, owner = self._archive_horizon(clients)
+            page = self._new_table()
+            self._store.load_table(accounts, "INBOX", limit, before=before, since=horizon, table=page)
+            if len(page) >= limit or owner is None:
+                return page
+            fetched = self._fetch_older(owner, limit)
+            if fetched is None:
+                if len(page):
+                    return page
+                raise ConnectionError(f"could not load older mail for {owner.account.address}")
+            if fetched:
+                self._routes.register(owner, fetched)
+                self._hide_known_spam(fetched)
+            else:
+                self._archive_complete.add(owner.account.key)
+        return self._new_table()
+
+    def load_older_async(self, before: MessageKey, callback, limit: int = INBOX_LIMIT) -> None:
+        """Run :meth:`load_older_messages` in the background; ``callback`` gets the page on the UI thread.
+
+        The page's previews are read in the background too, so painting its
+        rows never queries the store.
+        """
+
+        def load() -> MessageTable:
+            page = self.load_older_messages(before, limit)
+            page.load_previews()
+            return page
+
+        self._background.run(load, callback)
+
+    def load_previews_async(self, message_ids: Sequence[str], callback) -> None:
+        """Read the previews of ``message_ids`` in the background; ``callback`` gets ``{id: preview}``."""
+        self._background.run(lambda: self._store.load_previews(message_ids), callback)
+
+    def search(self, query: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> Sequence[MailMessage]:
+        """Return cached messages matching ``query``, best match first.
+
+        Results come from the local full-text index the sync keeps up to
+        date, so no server is asked; ``offset`` pages through the hits.
+        """
+        if any(client.uses_sample_data for client in self._clients):
+            return self._search_samples(query)[offset : offset + limit]
+        return self._store.search_messages(query, limit=limit, offset=offset)
+
+    def search_async(self, query: str, callback, limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> None:
+        """Run :meth:`search` in the background; ``callback`` gets the hits on the UI thread."""
+        self._background.run(lambda: self.search(query, limit, offset), callback)
+
+    def mark_as_read(self, message: MailMessage) -> None:
+        client = self._client_for(message)
+        if client is not None:
+            client.mark_as_read(message)
+            self._push_flags(client, message, seen=True)
+
+    def load_message_body_async(self, message: MailMessage, callback) -> None:
+        """Fetch the full body of ``message`` in the background."""
+        client = self._client_for(message)
+        if client is None:
+            return
+        if not self._on_engine(client):
+            self._background.run(lambda: client.fetch_message_body(message), callback)
+            return
+
+        async def load() -> str:
+            body = await asyncio.to_thread(client.known_body, message)
+            if body is not None:
+                return body
+            try:
+                return await self._with_session(client, lambda conn: client.fetch_message_body_async(conn, message))
+            except _ENGINE_ERRORS:
+                return message.preview
+
+        self._background.run_async(load(), callback)
 
     def toggle_flag(self, message: MailMessage) -> None:
+        client = self._client_for(message)
+        if client is not None:
+            client.toggle_flag(message)
+            self._push_flags(client, message, flagged=True)
+
+    def shutdown(self) -> None:
+        """Stop push, let background work finish, then close connections and stores.
+
+        Syncs and spam triage still running on the background runner write
+        to the stores, so those close last.
+        """
+        for listener in self._listeners:
+            listener.stop()
+        self._background.shutdown()
         for client in self._clients:
-            if client.owns_message(message):
-                client.toggle_flag(message)
-                break
+            client.close()
+        self._spam_manager.close()
+        self._store.close()
 
     def ensure_sample_client(self) -> None:
         if not self._clients:
@@ -79,6 +295,299 @@ class MailController:
                 protocol="demo",
             )
             self._clients.append(MailClient(sample_account, use_sample_data=True))
+            self._clients_by_key[sample_account.key] = self._clients[-1]
+
+    # ------------------------------ helpers --------------------------------
+    def _push_flags(self, client: MailClient, message: MailMessage, seen: bool = False, flagged: bool = False) -> None:
+        """Send a flag change made on the UI thread to the store and server in the background."""
+        if client.uses_sample_data:
+            return
+        if not self._on_engine(client):
+
+            def push() -> None:
+                client.push_flags(message, seen=seen, flagged=flagged)
+                self._spam_manager.observe([message])
+
+            self._background.run(push)
+            return
+
+        async def push_async() -> None:
+            try:
+                await self._with_session(client, lambda conn: client.push_flags_async(conn, message, seen, flagged))
+            except _ENGINE_ERRORS:
+                pass  # like the pooled push: the change stays local and the next sync shows the server's flags
+            await asyncio.to_thread(self._spam_manager.observe, [message])
+
+        self._background.run_async(push_async())
+
+    def _keep_connections_alive(self) -> None:
+        for client in list(self._clients):
+            client.keepalive()
+
+    def _client_for(self, message: MailMessage) -> MailClient | None:
+        """The client holding ``message``: the one that synced it, else the one for its account key."""
+        route = self._routes.route(message.id)
+        if route is not None:
+            return route.client
+        return self._clients_by_key.get(message.account_id)
+
+    def _cached_window(self, client: MailClient) -> tuple[Sequence[MailFolder], Sequence[MailMessage]]:
+        """Folders and newest inbox messages of ``client`` as last stored."""
+        if client.uses_sample_data:
+            return (), ()
+        key = client.account.key
+        messages = self._store.load_messages(key, "INBOX", INBOX_LIMIT)
+        self._routes.register(client, messages)
+        return self._store.load_folders(key), messages
+
+    def _merge_windows(
+        self, windows: Sequence[tuple[Sequence[MailFolder], Sequence[MailMessage]]]
+    ) -> InboxData:
+        folders = [folder for account_folders, _messages in windows for folder in account_folders]
+        messages = [message for _folders, account_messages in windows for message in account_messages]
+        return self._build_inbox(folders, messages)
+
+    def _finish_refresh(self, result: InboxData | Exception) -> None:
+        with self._refresh_lock:
+            callbacks, self._refresh_callbacks = self._refresh_callbacks, []
+            self._refresh_progress = []
+        if not isinstance(result, Exception):
+            result = self._reconcile_inbox(result)
+        for callback in callbacks:
+            callback(result)
+
+    def _start_account_load(self, client: MailClient) -> Future:
+        if self._on_engine(client):
+            return self._background.run_async(self._load_account_async(client))
+        return self._background.run(lambda: self._load_account(client))
+
+    def _on_engine(self, client: MailClient) -> bool:
+        """Whether ``client``'s IMAP work runs on the asyncio engine instead of its connection pool."""
+        return self._imap is not None and client.account.protocol.lower() == "imap" and not client.uses_sample_data
+
+    async def _with_session(self, client: MailClient, operation: Callable[[AsyncImapConnection], Awaitable[T]]) -> T:
+        """Run ``operation`` on the account's one shared engine session.
+
+        A kept-alive session may have been dropped by the server, so a
+        failure is retried once on a fresh one.
+        """
+        try:
+            return await operation(await self._imap.connection(client.account))
+        except _ENGINE_ERRORS:
+            self._imap.discard(client.account)
+        try:
+            return await operation(await self._imap.connection(client.account))
+        except _ENGINE_ERRORS:
+            self._imap.discard(client.account)
+            raise
+
+    async def _load_account_async(self, client: MailClient) -> tuple[Sequence[MailFolder], Sequence[MailMessage]]:
+        """Sync one IMAP account on the shared event loop; see :meth:`_load_account`."""
+        client_folders = client.list_primary_folders()
+        self._store.save_folders(client.account.key, client_folders)
+        inbox_messages = await self._with_session(
+            client, lambda conn: client.sync_folder_async(conn, "INBOX", INBOX_LIMIT)
+        )
+        # Spam triage touches SQLite; keep it off the loop so other accounts keep flowing.
+        return client_folders, await asyncio.to_thread(self._triage_spam, client, inbox_messages)
+
+    def _close_async_imap(self) -> None:
+        if self._imap is None:
+            return
+        try:
+            self._background.run_async(self._imap.close()).result(timeout=5.0)
+        except Exception:
+            pass
+
+    def _load_account(self, client: MailClient) -> tuple[Sequence[MailFolder], Sequence[MailMessage]]:
+        client_folders = client.list_primary_folders()
+        if not client.uses_sample_data:
+            self._store.save_folders(client.account.key, client_folders)
+        inbox_messages = client.fetch_inbox(limit=INBOX_LIMIT)
+        return client_folders, self._triage_spam(client, inbox_messages)
+
+    def _fetch_new_messages(self, client: MailClient, uids: Sequence[int]) -> Sequence[MailMessage]:
+        return self._triage_spam(client, client.fetch_messages(uids, limit=INBOX_LIMIT))
+
+    async def _fetch_new_messages_async(self, client: MailClient, uids: Sequence[int]) -> Sequence[MailMessage]:
+        try:
+            fetched = await self._with_session(
+                client, lambda conn: client.fetch_messages_async(conn, uids, "INBOX", INBOX_LIMIT)
+            )
+        except _ENGINE_ERRORS:
+            fetched = []
+        return await asyncio.to_thread(self._triage_spam, client, fetched)
+
+    def _fetch_older(self, client: MailClient, limit: int) -> list[MailMessage] | None:
+        """:meth:`MailClient.fetch_older` for the inbox, on the engine when the account uses it; blocks."""
+        if not self._on_engine(client):
+            return client.fetch_older("INBOX", limit)
+        operation = self._with_session(client, lambda conn: client.fetch_older_async(conn, "INBOX", limit))
+        try:
+            return self._background.run_async(operation).result()
+        except _ENGINE_ERRORS:
+            return None
+
+    def _triage_spam(self, client: MailClient, messages: Sequence[MailMessage]) -> Sequence[MailMessage]:
+        """Drop known spam and queue undecided messages for background classification.
+
+        Undecided messages are returned with ``spam_pending`` set so they can
+        be shown straight away; nothing here waits on the remote provider.
+        """
+        if not client.uses_sample_data:
+            self._spam_manager.observe(messages)
+        allowed, undecided, verdicts = self._spam_manager.triage(messages)
+        shown = {message.id for message in allowed}
+        shown.update(message.id for message in undecided)
+        if len(shown) != len(messages) and not client.uses_sample_data:
+            self._route_spam(client, [message for message in messages if message.id not in shown], verdicts)
+        for message in allowed:
+            message.spam_pending = False
+        for message in undecided:
+            message.spam_pending = True
+        self._routes.register(client, (message for message in messages if message.id in shown))
+        with self._classification_lock:
+            queued = [message for message in undecided if message.id not in self._classifying]
+            self._classifying.update(message.id for message in queued)
+        if queued:
+            self._background.run(lambda: self._classify(client, queued), self._on_classified)
+        return [message for message in messages if message.id in shown]
+
+    def _classify(self, client: MailClient, messages: Sequence[MailMessage]) -> SpamUpdate:
+        try:
+            verdicts = {item.message_id: item for item in self._spam_manager.classify_remote(messages)}
+        finally:
+            with self._classification_lock:
+                self._classifying.difference_update(message.id for message in messages)
+        spam = {message_id for message_id, item in verdicts.items() if item.is_spam}
+        self._routes.forget([message.id for message in messages if message.id in spam])
+        if not client.uses_sample_data:
+            self._route_spam(client, [message for message in messages if message.id in spam], verdicts)
+        with self._classification_lock:
+            for message in messages:
+                self._settled[message.id] = message.id in spam
+                self._settled.move_to_end(message.id)
+            while len(self._settled) > SETTLED_LIMIT:
+                self._settled.popitem(last=False)
+        return SpamUpdate(
+            spam_ids=[message.id for message in messages if message.id in spam],
+            cleared_ids=[message.id for message in messages if message.id not in spam],
+        )
+
+    def _route_spam(
+        self, client: MailClient, spam: Sequence[MailMessage], verdicts: dict[str, SpamAssessment]
+    ) -> None:
+        """Move confidently judged spam to the server's Junk folder in the background.
+
+        Moved messages leave the inbox for good, so later syncs neither
+        download nor classify them again.
+        """
+        config = self._config.spam
+        if not config.move_to_junk or not spam:
+            return
+        confident = [
+            message
+            for message in spam
+            if message.id in verdicts and verdicts[message.id].confidence >= config.move_min_confidence
+        ]
+        if not confident:
+            return
+        if not self._on_engine(client):
+            self._background.run(lambda: client.move_to_junk(confident))
+            return
+
+        async def move() -> None:
+            try:
+                await self._with_session(client, lambda conn: client.move_to_junk_async(conn, confident))
+            except _ENGINE_ERRORS:
+                pass  # like the pooled move: the spam stays hidden here but in the server's inbox
+
+        self._background.run_async(move())
+
+    def _search_samples(self, query: str) -> list[MailMessage]:
+        terms = query.casefold().split()
+        if not terms:
+            return []
+        hits: list[MailMessage] = []
+        for client in self._clients:
+            for message in client.fetch_inbox(limit=INBOX_LIMIT):
+                text = " ".join((message.subject, message.sender, message.preview, message.body or "")).casefold()
+                if all(term in text for term in terms):
+                    hits.append(message)
+        return hits
+
+    def _new_table(self) -> MessageTable:
+        return MessageTable(self._strings, preview_loader=self._store.load_previews)
+
+    def _archive_clients(self) -> list[MailClient]:
+        return [client for client in self._clients if not client.uses_sample_data]
+
+    def _archive_horizon(self, clients: Sequence[MailClient]) -> tuple[MessageKey | None, MailClient | None]:
+        """Oldest point down to which every account's inbox is in the store, and the account that sets it.
+
+        Below the horizon some account may still have mail on the server
+        only, so a newest-first listing must stop there until that account
+        has fetched more. ``(None, None)`` means the store is complete.
+        """
+        horizon: MessageKey | None = None
+        owner: MailClient | None = None
+        for client in clients:
+            if client.account.key in self._archive_complete:
+                continue
+            oldest = self._store.oldest_key(client.account.key, "INBOX")
+            if oldest is not None and (horizon is None or oldest > horizon):
+                horizon, owner = oldest, client
+        return horizon, owner
+
+    def _hide_known_spam(self, messages: Sequence[MailMessage]) -> None:
+        """Run the local spam checks on older mail; it is not worth a remote classification.
+
+        Spam they recognise lands in the verdict cache, which keeps it out of the store's pages.
+        """
+        self._spam_manager.triage(messages)
+
+    def _on_classified(self, result: SpamUpdate | Exception) -> None:
+        if isinstance(result, Exception) or self._classification_listener is None:
+            return
+        self._classification_listener(result)
+
+    def _reconcile(self, messages: Sequence[MailMessage]) -> list[MailMessage]:
+        """Apply verdicts that arrived after ``messages`` were triaged."""
+        with self._classification_lock:
+            settled = {message.id: self._settled.get(message.id) for message in messages if message.spam_pending}
+        for message in messages:
+            if settled.get(message.id) is False:
+                message.spam_pending = False
+        return [message for message in messages if not settled.get(message.id)]
+
+    def _reconcile_inbox(self, inbox: InboxData) -> InboxData:
+        messages = self._reconcile(inbox.messages)
+        if len(messages) == len(inbox.messages):
+            return inbox
+        kept = {message.id for message in messages}
+        hidden_unread = sum(message.is_unread for message in inbox.messages if message.id not in kept)
+        return InboxData(inbox.folders, messages, inbox.unread_count - hidden_unread)
+
+    def _build_inbox(self, folders: Iterable[MailFolder], messages: list[MailMessage]) -> InboxData:
+        """Merge per-account results, newest first.
+
+        Messages older than the archive horizon are left out: another
+        account may have mail in between that only paging will bring in, so
+        the list continues with :meth:`load_older_messages` from there.
+        """
+        horizon, _owner = self._archive_horizon(self._archive_clients())
+        if horizon is not None:
+            messages = [message for message in messages if message_key(message) >= horizon]
+        # Count what the list shows, so the sidebar agrees with the rows.
+        unread_count = sum(message.is_unread for message in messages)
+        messages.sort(key=message_key, reverse=True)
+        unique: dict[tuple[str, str], MailFolder] = {}
+        for folder in folders:
+            key = (folder.name, folder.display_name)
+            if key not in unique or folder.is_primary:
+                unique[key] = folder
+        ordered_folders = sorted(unique.values(), key=lambda f: f.sort_index)
+        return InboxData(folders=ordered_folders, messages=messages, unread_count=unread_count)
 
 
-__all__ = ["InboxData", "MailController"]
+__all__ = ["INBOX_LIMIT", "InboxData", "MailController", "SEARCH_PAGE_SIZE", "SpamUpdate"]
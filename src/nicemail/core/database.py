@@ -0,0 +1,44 @@
+"""The SQLite database holding the mail cache and everything learned about it."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class Database:
+    """One SQLite connection in WAL mode, shared by all threads and serialised with :attr:`lock`.
+
+    The message store and the spam tiers each create their tables in the
+    same database, so the cache directory holds a single file. Passing
+    ``path=None`` keeps everything in memory.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+
+    @classmethod
+    def open(cls, path: Path) -> Database:
+        """Open the database at ``path``, or an in-memory one when the file can't be used."""
+        try:
+            return cls(path)
+        except (OSError, sqlite3.Error):
+            return cls()
+
+    def create_tables(self, schema: str) -> None:
+        with self.lock:
+            self.connection.executescript(schema)
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+__all__ = ["Database"]
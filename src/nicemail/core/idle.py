@@ -0,0 +1,256 @@
+"""Push notifications for new mail using IMAP IDLE (or NOOP polling)."""
+from __future__ import annotations
+
+import asyncio
+import imaplib
+import re
+import select
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable, Coroutine, Sequence
+
+from .async_imap import AsyncImapConnection, AsyncImapEngine, AsyncImapError
+from .config import MailAccountConfig
+from .imap_pool import CONNECTION_ERRORS, PooledConnection, close_connection, open_connection
+
+NewMailCallback = Callable[[Sequence[int]], None]
+# Schedules a coroutine on the shared event loop, e.g. BackgroundTaskRunner.run_async.
+CoroutineRunner = Callable[[Coroutine[Any, Any, Any]], Future]
+
+_EXISTS_RE = re.compile(rb"^\* \d+ EXISTS")
+
+
+class _LineReader:
+    """Read CRLF-terminated lines straight from the socket with a timeout.
+
+    imaplib's buffered file object becomes unusable after a socket timeout,
+    so while IDLE is active we wait on the socket with ``select`` instead.
+    """
+
+    def __init__(self, client: imaplib.IMAP4) -> None:
+        self._sock = client.sock
+        self._buffer = b""
+
+    def readline(self, timeout: float) -> bytes | None:
+        deadline = time.monotonic() + timeout
+        while b"\r\n" not in self._buffer:
+            pending = getattr(self._sock, "pending", lambda: 0)()
+            if not pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                ready, _, _ = select.select([self._sock], [], [], remaining)
+                if not ready:
+                    return None
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise imaplib.IMAP4.abort("server closed the IDLE connection")
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\r\n")
+        return line
+
+
+class IdleListener:
+    """Watch one account's folder on a dedicated connection and report new UIDs.
+
+    Uses IDLE when the server supports it (re-issued every ``idle_interval``
+    seconds, as RFC 2177 recommends) and falls back to a ``NOOP`` every
+    ``poll_interval`` seconds otherwise. ``on_new_mail`` runs on the listener
+    thread with the UIDs that appeared since the last report.
+
+    This holds one thread per account; with the asyncio engine enabled,
+    :class:`AsyncIdleListener` does the same on the shared event loop.
+    """
+
+    def __init__(
+        self,
+        account: MailAccountConfig,
+        on_new_mail: NewMailCallback,
+        folder: str = "INBOX",
+        idle_interval: float = 25 * 60,
+        poll_interval: float = 60.0,
+        retry_delay: float = 30.0,
+    ) -> None:
+        self.account = account
+        self._on_new_mail = on_new_mail
+        self._folder = folder
+        self._idle_interval = idle_interval
+        self._poll_interval = poll_interval
+        self._retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._tag_counter = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"nicemail-idle-{self.account.address}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread is not None and timeout:
+            self._thread.join(timeout)
+
+    # ------------------------------ internals ------------------------------
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            conn: PooledConnection | None = None
+            try:
+                conn = open_connection(self.account)
+                self._listen(conn)
+            except (imaplib.IMAP4.error, *CONNECTION_ERRORS):
+                self._stop.wait(self._retry_delay)
+            finally:
+                if conn is not None:
+                    close_connection(conn)
+
+    def _listen(self, conn: PooledConnection) -> None:
+        client = conn.client
+        typ, _ = conn.select(self._folder, readonly=True, force=True)
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"cannot examine {self._folder}")
+        uidnext = self._uidnext(client)
+        use_idle = "IDLE" in client.capabilities
+        while not self._stop.is_set():
+            changed = self._idle_once(client) if use_idle else self._poll_once(client)
+            if not changed or self._stop.is_set():
+                continue
+            typ, data = client.uid("SEARCH", None, f"UID {uidnext}:*")
+            if typ != "OK" or not data or not data[0]:
+                continue
+            new_uids = sorted(uid for uid in (int(value) for value in data[0].split()) if uid >= uidnext)
+            if new_uids:
+                uidnext = new_uids[-1] + 1
+                self._on_new_mail(new_uids)
+
+    def _idle_once(self, client: imaplib.IMAP4) -> bool:
+        """Run one IDLE cycle; return True when the server announced new messages."""
+        self._tag_counter += 1
+        tag = f"NMIDLE{self._tag_counter}".encode("ascii")
+        client.send(tag + b" IDLE\r\n")
+        reader = _LineReader(client)
+        line = reader.readline(30.0)
+        if line is None or not line.startswith(b"+"):
+            raise imaplib.IMAP4.abort("server did not accept IDLE")
+
+        changed = False
+        deadline = time.monotonic() + self._idle_interval
+        while not changed and not self._stop.is_set() and time.monotonic() < deadline:
+            line = reader.readline(1.0)
+            if line is None:
+                continue
+            if line.startswith(b"* BYE"):
+                raise imaplib.IMAP4.abort("server ended the IDLE session")
+            changed = bool(_EXISTS_RE.match(line))
+
+        client.send(b"DONE\r\n")
+        while True:
+            line = reader.readline(30.0)
+            if line is None:
+                raise imaplib.IMAP4.abort("no reply to IDLE DONE")
+            if line.startswith(tag):
+                return changed
+            changed = changed or bool(_EXISTS_RE.match(line))
+
+    def _poll_once(self, client: imaplib.IMAP4) -> bool:
+        if self._stop.wait(self._poll_interval):
+            return False
+        client.noop()
+        _typ, data = client.response("EXISTS")
+        return any(data or [])
+
+    @staticmethod
+    def _uidnext(client: imaplib.IMAP4) -> int:
+        _typ, data = client.response("UIDNEXT")
+        for value in reversed(data or []):
+            if value:
+                try:
+                    return int(value)
+                except ValueError:
+                    continue
+        return 1
+
+
+class AsyncIdleListener:
+    """:class:`IdleListener` as a task on the :class:`AsyncImapEngine` loop.
+
+    Each account waits in IDLE (or sleeps between ``NOOP`` polls) without
+    holding a thread, on a connection of its own next to the engine's sync
+    connection. ``on_new_mail`` runs on the loop thread, so it must only
+    hand the work off.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncImapEngine,
+        account: MailAccountConfig,
+        on_new_mail: NewMailCallback,
+        folder: str = "INBOX",
+        idle_interval: float = 25 * 60,
+        poll_interval: float = 60.0,
+        retry_delay: float = 30.0,
+    ) -> None:
+        self.account = account
+        self._engine = engine
+        self._on_new_mail = on_new_mail
+        self._folder = folder
+        self._idle_interval = idle_interval
+        self._poll_interval = poll_interval
+        self._retry_delay = retry_delay
+        self._task: Future | None = None
+
+    def start(self, run_async: CoroutineRunner) -> None:
+        if self._task is None or self._task.done():
+            self._task = run_async(self._run())
+
+    def stop(self, timeout: float | None = None) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        if timeout:
+            try:
+                task.result(timeout)
+            except (CancelledError, TimeoutError):
+                pass
+
+    # ------------------------------ internals ------------------------------
+    async def _run(self) -> None:
+        while True:
+            conn: AsyncImapConnection | None = None
+            try:
+                conn = await self._engine.open(self.account)
+                await self._listen(conn)
+            except (AsyncImapError, OSError, asyncio.TimeoutError):
+                await asyncio.sleep(self._retry_delay)
+            finally:
+                if conn is not None:
+                    conn.abort()
+
+    async def _listen(self, conn: AsyncImapConnection) -> None:
+        reply = await conn.select(self._folder, readonly=True)
+        if not reply.ok:
+            raise AsyncImapError(f"cannot examine {self._folder}")
+        uidnext = reply.code("UIDNEXT") or 1
+        use_idle = "IDLE" in conn.capabilities
+        while True:
+            if use_idle:
+                changed = await conn.idle(self._idle_interval)
+            else:
+                await asyncio.sleep(self._poll_interval)
+                changed = bool((await conn.command("NOOP")).data("EXISTS"))
+            if not changed:
+                continue
+            search = await conn.command(f"UID SEARCH UID {uidnext}:*")
+            new_uids = [uid for uid in search.search_uids() if uid >= uidnext] if search.ok else []
+            if new_uids:
+                uidnext = new_uids[-1] + 1
+                self._on_new_mail(new_uids)
+
+
+__all__ = ["AsyncIdleListener", "IdleListener", "NewMailCallback"]
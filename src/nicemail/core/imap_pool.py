@@ -0,0 +1,269 @@
+"""Pooled IMAP connections shared by all mail operations of an account."""
+from __future__ import annotations
+
+import imaplib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, TypeVar
+
+from .config import MailAccountConfig
+
+T = TypeVar("T")
+
+# Errors that mean the connection itself is unusable and must be replaced.
+# ``imaplib.IMAP4.error`` (a NO/BAD reply) leaves the session intact.
+CONNECTION_ERRORS: tuple[type[BaseException], ...] = (imaplib.IMAP4.abort, OSError, EOFError)
+
+
+@dataclass(slots=True)
+class PooledConnection:
+    """An authenticated IMAP session plus the bookkeeping the pool needs."""
+
+    client: imaplib.IMAP4
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    # When the session last talked to the server, including keepalive NOOPs.
+    last_checked: float = field(default_factory=time.monotonic)
+    mailbox: str | None = None
+    readonly: bool = False
+    enabled: frozenset[str] = frozenset()
+
+    def select(self, mailbox: str = "INBOX", readonly: bool = False, force: bool = False) -> tuple[str, list]:
+        """Select ``mailbox`` unless this session already has it open."""
+        if not force and self.mailbox == mailbox and self.readonly == readonly:
+            return "OK", []
+        typ, data = self.client.select(mailbox, readonly=readonly)
+        if typ == "OK":
+            self.mailbox = mailbox
+            self.readonly = readonly
+        else:
+            self.mailbox = None
+        return typ, data
+
+
+class ImapConnectionPool:
+    """Keep a bounded number of logged-in IMAP sessions per account.
+
+    Connections are handed out with :meth:`connection` (or :meth:`run`, which
+    also retries once on a fresh session when a pooled one turns out to be
+    dead). Idle sessions are checked with ``NOOP`` before reuse and closed
+    once they have been idle for longer than ``idle_timeout``; call
+    :meth:`keepalive` periodically so that also happens while nothing asks
+    for a connection.
+    """
+
+    def __init__(
+        self,
+        account: MailAccountConfig,
+        max_size: int = 2,
+        idle_timeout: float = 300.0,
+        keepalive_interval: float = 60.0,
+        connect_timeout: float = 30.0,
+        acquire_timeout: float = 60.0,
+    ) -> None:
+        self.account = account
+        self._max_size = max(1, max_size)
+        self._idle_timeout = idle_timeout
+        self._keepalive_interval = keepalive_interval
+        self._connect_timeout = connect_timeout
+        self._acquire_timeout = acquire_timeout
+        self._idle: list[PooledConnection] = []
+        self._in_use = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    # ------------------------------ public ---------------------------------
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        pooled = self._acquire()
+        try:
+            yield pooled
+        except CONNECTION_ERRORS:
+            self._discard(pooled)
+            raise
+        except BaseException:
+            self._release(pooled)
+            raise
+        else:
+            self._release(pooled)
+
+    def run(self, operation: Callable[[PooledConnection], T]) -> T:
+        """Run ``operation`` on a pooled session, reconnecting once on failure."""
+        try:
+            with self.connection() as pooled:
+                return operation(pooled)
+        except CONNECTION_ERRORS:
+            with self.connection() as pooled:
+                return operation(pooled)
+
+    def reap_idle(self) -> None:
+        """Close sessions that have been idle for longer than ``idle_timeout``."""
+        now = time.monotonic()
+        with self._condition:
+            stale = [conn for conn in self._idle if now - conn.last_used > self._idle_timeout]
+            self._idle = [conn for conn in self._idle if conn not in stale]
+        for conn in stale:
+            self._logout(conn)
+
+    def keepalive(self) -> None:
+        """Reap stale sessions and ``NOOP`` idle ones not heard from for ``keepalive_interval``.
+
+        Servers drop quiet sessions after a while; this keeps the pooled ones
+        usable (or replaces dead ones on next use) while the app sits idle.
+        """
+        self.reap_idle()
+        now = time.monotonic()
+        with self._condition:
+            due = [conn for conn in self._idle if now - conn.last_checked >= self._keepalive_interval]
+            self._idle = [conn for conn in self._idle if conn not in due]
+            self._in_use += len(due)
+        for conn in due:
+            if self._ping(conn):
+                self._release(conn, used=False)
+            else:
+                self._discard(conn)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for conn in idle:
+            self._logout(conn)
+
+    @property
+    def size(self) -> int:
+        with self._condition:
+            return self._in_use + len(self._idle)
+
+    # ------------------------------ internals ------------------------------
+    def _acquire(self) -> PooledConnection:
+        self.reap_idle()
+        deadline = time.monotonic() + self._acquire_timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise imaplib.IMAP4.abort("connection pool is closed")
+                if self._idle:
+                    candidate: PooledConnection | None = self._idle.pop()
+                    self._in_use += 1
+                elif self._in_use < self._max_size:
+                    candidate = None
+                    self._in_use += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise imaplib.IMAP4.abort("timed out waiting for a pooled IMAP connection")
+                    self._condition.wait(remaining)
+                    continue
+
+            if candidate is None:
+                try:
+                    return self._connect()
+                except BaseException:
+                    self._forget_slot()
+                    raise
+            if time.monotonic() - candidate.last_checked < self._keepalive_interval or self._ping(candidate):
+                return candidate
+            self._logout(candidate)
+            self._forget_slot()
+
+    def _release(self, conn: PooledConnection, used: bool = True) -> None:
+        conn.last_checked = time.monotonic()
+        if used:
+            conn.last_used = conn.last_checked
+        with self._condition:
+            self._in_use -= 1
+            if self._closed:
+                close_now = True
+            else:
+                close_now = False
+                self._idle.append(conn)
+            self._condition.notify()
+        if close_now:
+            self._logout(conn)
+
+    def _discard(self, conn: PooledConnection) -> None:
+        self._forget_slot()
+        self._logout(conn)
+
+    def _forget_slot(self) -> None:
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def _connect(self) -> PooledConnection:
+        return open_connection(self.account, self._connect_timeout)
+
+    @staticmethod
+    def _ping(conn: PooledConnection) -> bool:
+        try:
+            typ, _ = conn.client.noop()
+        except (imaplib.IMAP4.error, *CONNECTION_ERRORS):
+            return False
+        conn.last_checked = time.monotonic()
+        return typ == "OK"
+
+    @staticmethod
+    def _logout(conn: PooledConnection) -> None:
+        close_connection(conn)
+
+
+def open_connection(account: MailAccountConfig, timeout: float = 30.0) -> PooledConnection:
+    """Connect, log in and enable the extensions we use; not tied to any pool."""
+    host, port = account.incoming_server, account.port
+    if account.use_ssl:
+        client: imaplib.IMAP4 = imaplib.IMAP4_SSL(host, port, timeout=timeout)
+    else:
+        client = imaplib.IMAP4(host, port, timeout=timeout)
+    try:
+        client.login(account.username or account.address, account.password or "")
+        enabled = _enable_extensions(client)
+    except BaseException:
+        _shutdown_socket(client)
+        raise
+    return PooledConnection(client=client, enabled=enabled)
+
+
+def close_connection(conn: PooledConnection) -> None:
+    try:
+        conn.client.logout()
+    except Exception:
+        _shutdown_socket(conn.client)
+
+
+def _enable_extensions(client: imaplib.IMAP4) -> frozenset[str]:
+    """Turn on CONDSTORE/QRESYNC when advertised, so SELECT reports HIGHESTMODSEQ."""
+    typ, data = client.capability()
+    if typ == "OK" and data and data[-1]:
+        client.capabilities = tuple(data[-1].decode("ascii", "replace").upper().split())
+    if "ENABLE" not in client.capabilities:
+        return frozenset()
+    for extension, implied in (("QRESYNC", {"QRESYNC", "CONDSTORE"}), ("CONDSTORE", {"CONDSTORE"})):
+        if extension not in client.capabilities:
+            continue
+        try:
+            typ, _ = client.enable(extension)
+        except imaplib.IMAP4.error:
+            continue
+        if typ == "OK":
+            return frozenset(implied)
+    return frozenset()
+
+
+def _shutdown_socket(client: imaplib.IMAP4) -> None:
+    try:
+        client.shutdown()
+    except Exception:
+        pass
+
+
+__all__ = [
+    "CONNECTION_ERRORS",
+    "ImapConnectionPool",
+    "PooledConnection",
+    "close_connection",
+    "open_connection",
+]
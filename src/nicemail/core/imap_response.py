@@ -0,0 +1,128 @@
+"""Helpers for parsing IMAP ``FETCH`` responses returned by :mod:`imaplib`."""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+_RECORD_START = re.compile(rb"^\s*(\d+) \(")
+_UID = re.compile(rb"\bUID (\d+)")
+_FLAGS = re.compile(rb"\bFLAGS \(([^)]*)\)")
+_MODSEQ = re.compile(rb"\bMODSEQ \((\d+)\)")
+_SECTION = rb"(?:BODY|BINARY)\[[^\]]*\](?:<\d+>)?|RFC822(?:\.HEADER|\.TEXT)?"
+_LITERAL_KEY = re.compile(rb"(" + _SECTION + rb")\s*\{\d+\}$")
+_QUOTED_SECTION = re.compile(rb"(" + _SECTION + rb") \"((?:[^\"\\]|\\.)*)\"")
+_ORIGIN = re.compile(r"<\d+>$")
+
+
+@dataclass(slots=True)
+class FetchRecord:
+    """Attributes returned for a single message in a ``FETCH`` response."""
+
+    sequence: int
+    uid: int | None = None
+    flags: tuple[str, ...] = ()
+    modseq: int | None = None
+    sections: dict[str, bytes] = field(default_factory=dict)
+
+    def section(self, prefix: str) -> bytes | None:
+        """Return the first body section whose name starts with ``prefix``."""
+        prefix = prefix.upper()
+        for name, value in self.sections.items():
+            if name.startswith(prefix):
+                return value
+        return None
+
+    def has_flag(self, flag: str) -> bool:
+        return flag in self.flags
+
+
+def parse_fetch_response(data: Iterable[bytes | tuple[bytes, bytes] | None]) -> Iterator[FetchRecord]:
+    """Group the raw ``imaplib`` fetch payload into one record per message.
+
+    ``imaplib`` returns plain ``bytes`` for response lines without literals and
+    ``(prefix, literal)`` tuples when the server sent a ``{n}`` literal. A
+    single message may span several of those entries, so records are yielded
+    as soon as the next message starts.
+    """
+    meta: list[bytes] = []
+    current: FetchRecord | None = None
+    for entry in data:
+        if entry is None:
+            continue
+        if isinstance(entry, tuple):
+            prefix, literal = entry[0], entry[1]
+        else:
+            prefix, literal = entry, None
+        start = _RECORD_START.match(prefix)
+        if start:
+            if current is not None:
+                yield _finish(current, meta)
+            current = FetchRecord(sequence=int(start.group(1)))
+            meta = []
+        if current is None:
+            continue
+        if literal is not None:
+            key = _LITERAL_KEY.search(prefix.rstrip())
+            if key:
+                current.sections[_section_name(key.group(1))] = literal
+        meta.append(prefix)
+    if current is not None:
+        yield _finish(current, meta)
+
+
+def format_uid_set(uids: Iterable[int]) -> str:
+    """Compress ``uids`` into an IMAP sequence set such as ``1:4,9,12:13``."""
+    ordered = sorted(set(uids))
+    if not ordered:
+        return ""
+    parts: list[str] = []
+    start = previous = ordered[0]
+    for uid in ordered[1:]:
+        if uid == previous + 1:
+            previous = uid
+            continue
+        parts.append(str(start) if start == previous else f"{start}:{previous}")
+        start = previous = uid
+    parts.append(str(start) if start == previous else f"{start}:{previous}")
+    return ",".join(parts)
+
+
+def parse_uid_ranges(value: bytes | str) -> list[tuple[int, int]]:
+    """Parse a UID set such as ``41,43:116`` (optionally ``(EARLIER)``-prefixed)."""
+    if isinstance(value, bytes):
+        value = value.decode("ascii", "replace")
+    value = value.replace("(EARLIER)", "").strip()
+    ranges: list[tuple[int, int]] = []
+    for part in value.split(","):
+        low, _, high = part.strip().partition(":")
+        try:
+            start, end = int(low), int(high or low)
+        except ValueError:
+            continue
+        ranges.append((min(start, end), max(start, end)))
+    return ranges
+
+
+def _finish(record: FetchRecord, meta: list[bytes]) -> FetchRecord:
+    text = b" ".join(meta)
+    uid = _UID.search(text)
+    if uid:
+        record.uid = int(uid.group(1))
+    flags = _FLAGS.search(text)
+    if flags:
+        record.flags = tuple(flag.decode("ascii", "replace") for flag in flags.group(1).split())
+    modseq = _MODSEQ.search(text)
+    if modseq:
+        record.modseq = int(modseq.group(1))
+    for match in _QUOTED_SECTION.finditer(text):
+        name = _section_name(match.group(1))
+        record.sections.setdefault(name, re.sub(rb"\\(.)", rb"\1", match.group(2)))
+    return record
+
+
+def _section_name(raw: bytes) -> str:
+    return _ORIGIN.sub("", raw.decode("ascii", "replace").upper())
+
+
+__all__ = ["FetchRecord", "format_uid_set", "parse_fetch_response", "parse_uid_ranges"]
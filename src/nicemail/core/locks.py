@@ -0,0 +1,81 @@
+"""A mutex shared by worker threads and coroutines on an event loop."""
+from __future__ import annotations
+
+import asyncio
+import threading
+
+
+class HybridLock:
+    """Mutual exclusion between threads and asyncio tasks.
+
+    Threads block in ``with lock:``; coroutines use ``async with lock:`` and
+    wait on a future that :meth:`release` resolves, so a coroutine waiting
+    for a thread never blocks its event loop nor polls. Not reentrant.
+    """
+
+    def __init__(self) -> None:
+        self._mutex = threading.Lock()
+        self._released = threading.Condition(self._mutex)
+        self._locked = False
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def acquire(self) -> None:
+        with self._mutex:
+            while self._locked:
+                self._released.wait()
+            self._locked = True
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._mutex:
+                if not self._locked:
+                    self._locked = True
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._mutex:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def release(self) -> None:
+        with self._mutex:
+            if not self._locked:
+                raise RuntimeError("release of an unlocked HybridLock")
+            self._locked = False
+            waiters, self._waiters = self._waiters, []
+            self._released.notify()
+        # Every waiting coroutine retries; whoever runs first takes the lock.
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # that loop is closed; nothing is waiting on it any more
+                pass
+
+    def locked(self) -> bool:
+        return self._locked
+
+    def __enter__(self) -> HybridLock:
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
+
+    async def __aenter__(self) -> HybridLock:
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+__all__ = ["HybridLock"]
@@ -4,14 +4,59 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Sequence
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
 
-import imaplib
+import base64
+import binascii
 import email
+import email.utils
+import html
+import quopri
+import re
 from email.header import decode_header
 from email.message import Message
 
+from .async_imap import AsyncImapConnection, ResponseEntry
 from .config import MailAccountConfig
+from .imap_pool import ImapConnectionPool, PooledConnection
+from .imap_response import FetchRecord, format_uid_set, parse_fetch_response, parse_uid_ranges
+from .locks import HybridLock
+from .sync_state import FolderSyncState, SyncStateStore
+
+if TYPE_CHECKING:
+    from .store import MessageStore
+
+# Bytes of the first body part fetched for the list preview. Generous enough to
+# survive quoted-printable/base64 overhead while still trimming to 200 chars.
+PREVIEW_FETCH_BYTES = 2048
+PREVIEW_LENGTH = 200
+ENVELOPE_HEADERS = ("SUBJECT", "FROM", "DATE", "CONTENT-TYPE", "CONTENT-TRANSFER-ENCODING")
+# BODY[1.MIME] carries part 1's own Content-Type/Content-Transfer-Encoding in multipart mail.
+ENVELOPE_FETCH_ITEMS = (
+    f"(UID FLAGS BODY.PEEK[HEADER.FIELDS ({' '.join(ENVELOPE_HEADERS)})] BODY.PEEK[1.MIME] "
+    f"BODY.PEEK[1]<0.{PREVIEW_FETCH_BYTES}>)"
+)
+
+# How a cached window is brought up to date, see MailClient._resync_mode.
+RESYNC_NONE = "none"
+RESYNC_FULL = "full"
+RESYNC_CHANGEDSINCE = "changedsince"
+RESYNC_QRESYNC = "qresync"
+
+# Checked in order when the server does not mark a folder with the \Junk special-use attribute.
+JUNK_FOLDER_NAMES = (
+    "Junk",
+    "Spam",
+    "Junk E-mail",
+    "Junk Email",
+    "Bulk Mail",
+    "[Gmail]/Spam",
+    "INBOX.Junk",
+    "INBOX.Spam",
+)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_LIST_RE = re.compile(rb'^\((?P<flags>[^)]*)\) (?:"(?:[^"\\]|\\.)*"|NIL) (?P<name>.+)$')
 
 
 @dataclass(slots=True)
@@ -34,16 +79,39 @@ class MailMessage:
     date_received: datetime
     is_unread: bool = True
     is_flagged: bool = False
+    is_answered: bool = False
     folder: str = "INBOX"
+    body: str | None = None
+    uid: int = 0
+    spam_pending: bool = False
 
 
 class MailClient:
     """Minimal client capable of fetching messages."""
 
-    def __init__(self, account: MailAccountConfig, use_sample_data: bool = False) -> None:
+    def __init__(
+        self,
+        account: MailAccountConfig,
+        use_sample_data: bool = False,
+        sync_state: SyncStateStore | None = None,
+        store: MessageStore | None = None,
+    ) -> None:
         self.account = account
         self._use_sample_data = use_sample_data
         self._sample_messages: list[MailMessage] | None = None
+        self._pool = ImapConnectionPool(account)
+        self._sync_state = sync_state or SyncStateStore()
+        self._store = store
+        # Guards the folder windows, which pooled operations on threads and engine ones on the loop share.
+        self._sync_lock = HybridLock()
+        # folder name -> uid -> message, the window of mail we already hold
+        self._folder_cache: dict[str, dict[int, MailMessage]] = {}
+        # None until looked up; "" when the account has no Junk folder.
+        self._junk_folder: str | None = None
+
+    @property
+    def uses_sample_data(self) -> bool:
+        return self._use_sample_data or self.account.protocol == "demo"
 
     # ----------------------------- folder helpers --------------------------
     def list_primary_folders(self) -> Sequence[MailFolder]:
@@ -60,6 +128,11 @@ class MailClient:
 
     # ------------------------------- fetching ------------------------------
     def fetch_inbox(self, limit: int = 50) -> Sequence[MailMessage]:
+        """Return the newest ``limit`` inbox messages, newest first.
+
+        Raises when the server cannot be reached, so callers can tell a
+        failed sync from an empty inbox.
+        """
         if self._use_sample_data or self.account.protocol == "demo":
             return self._load_sample_messages()[:limit]
         if self.account.protocol.lower() == "imap":
@@ -67,73 +140,601 @@ class MailClient:
         # Placeholder for POP3, SMTP fetch etc.
         return []
 
+    def fetch_messages(self, uids: Sequence[int], folder: str = "INBOX", limit: int = 50) -> Sequence[MailMessage]:
+        """Fetch envelopes for specific ``uids`` (e.g. reported by IDLE), newest first.
+
+        ``limit`` is the size of the folder's sync window, which is loaded
+        from the store first if this is the folder's first use.
+        """
+        if self._use_sample_data or self.account.protocol.lower() != "imap" or not uids:
+            return []
+        try:
+            return self._pool.run(lambda conn: self._fetch_uids_on(conn, folder, uids, limit))
+        except Exception:
+            return []
+
+    def fetch_older(self, folder: str = "INBOX", limit: int = 50) -> list[MailMessage] | None:
+        """Download up to ``limit`` messages older than anything cached for ``folder``.
+
+        This is how history beyond the sync window reaches the store when the
+        user scrolls back. Returns the new messages newest first, an empty
+        list once nothing older exists, or ``None`` if the server could not
+        be asked (including before the first sync).
+        """
+        if self.uses_sample_data or self.account.protocol.lower() != "imap" or self._store is None:
+            return []
+        try:
+            return self._pool.run(lambda conn: self._fetch_older_on(conn, folder, limit))
+        except Exception:
+            return None
+
     def owns_message(self, message: MailMessage) -> bool:
-        return message.account_id == self.account.address
+        return message.account_id == self.account.key
 
     def mark_as_read(self, message: MailMessage) -> None:
+        """Mark ``message`` read locally; :meth:`push_flags` tells the store and server."""
         message.is_unread = False
-        if not self._use_sample_data:
-            self._imap_flag(message, mark_read=True)
 
     def toggle_flag(self, message: MailMessage) -> None:
+        """Flip the star locally; :meth:`push_flags` tells the store and server."""
         message.is_flagged = not message.is_flagged
-        if not self._use_sample_data:
-            self._imap_flag(message, toggle_star=True)
 
-    # ------------------------------- IMAP ----------------------------------
-    def _fetch_imap(self, limit: int) -> Sequence[MailMessage]:
-        messages: list[MailMessage] = []
+    def push_flags(self, message: MailMessage, seen: bool = False, flagged: bool = False) -> None:
+        """Save the flags of ``message`` and send them to the server (blocking).
+
+        ``seen`` adds ``\\Seen``; ``flagged`` sets ``\\Flagged`` to whatever
+        ``message.is_flagged`` is when the command goes out, so quick repeated
+        toggles settle on the last state whichever push runs first.
+        """
+        if self._use_sample_data:
+            return
+        self._persist_flags([message])
+        if self.account.protocol.lower() == "imap":
+            self._imap_flag(message, seen=seen, flagged=flagged)
+
+    def keepalive(self) -> None:
+        """Keep pooled IMAP sessions usable while idle; see :meth:`ImapConnectionPool.keepalive`."""
+        if not self._use_sample_data and self.account.protocol.lower() == "imap":
+            self._pool.keepalive()
+
+    def fetch_message_body(self, message: MailMessage) -> str:
+        """Download the full text of ``message``; the inbox list only holds a preview."""
+        body = self.known_body(message)
+        if body is not None:
+            return body
         try:
-            with imaplib.IMAP4_SSL(self.account.incoming_server, self.account.port) as client:
-                client.login(self.account.username or self.account.address, self.account.password or "")
-                client.select("INBOX")
-                typ, data = client.search(None, "ALL")
-                if typ != "OK":
-                    return []
-                ids = data[0].split()[-limit:]
-                for msg_id in reversed(ids):
-                    typ, msg_data = client.fetch(msg_id, "(RFC822 FLAGS)")
-                    if typ != "OK":
-                        continue
-                    raw_email = msg_data[0][1]
-                    email_message = email.message_from_bytes(raw_email)
-                    subject = self._decode_header(email_message.get("Subject", "(No subject)"))
-                    sender = self._decode_header(email_message.get("From", "Unknown sender"))
-                    preview = self._extract_preview(email_message)
-                    date_tuple = email.utils.parsedate_to_datetime(email_message.get("Date"))
-                    date_received = date_tuple.astimezone(timezone.utc) if date_tuple else datetime.now(timezone.utc)
-                    flags = msg_data[1].decode() if len(msg_data) > 1 and isinstance(msg_data[1], bytes) else ""
-                    message = MailMessage(
-                        id=f"{self.account.address}:{msg_id.decode()}",
-                        account_id=self.account.address,
-                        subject=subject,
-                        sender=sender,
-                        preview=preview,
-                        date_received=date_received,
-                        is_unread="\\Seen" not in flags,
-                        is_flagged="\\Flagged" in flags,
-                    )
-                    messages.append(message)
+            body = self._pool.run(lambda conn: self._fetch_body_on(conn, message))
+        except Exception:
+            return message.preview
+        return self._keep_body(message, body)
+
+    def known_body(self, message: MailMessage) -> str | None:
+        """The full text of ``message`` if it needs no download (held, stored or not on a server)."""
+        if message.body is not None:
+            return message.body
+        if self._use_sample_data or self.account.protocol.lower() != "imap":
+            message.body = message.preview
+            return message.body
+        if self._store is not None:
+            message.body = self._store.load_body(message.id)
+        return message.body
+
+    def move_to_junk(self, messages: Sequence[MailMessage]) -> list[MailMessage]:
+        """Move ``messages`` to the account's Junk folder, one command per source folder.
+
+        Uses ``UID MOVE`` when available and ``COPY`` + ``\\Deleted`` + expunge
+        otherwise. Moved messages leave the local cache and store. Returns
+        what was moved; nothing is when the account has no Junk folder.
+        """
+        if self._use_sample_data or self.account.protocol.lower() != "imap" or not messages:
+            return []
+        try:
+            return self._pool.run(lambda conn: self._move_to_junk_on(conn, messages))
         except Exception:
             return []
-        return messages
 
-    def _imap_flag(self, message: MailMessage, mark_read: bool = False, toggle_star: bool = False) -> None:
+    def close(self) -> None:
+        self._pool.close()
+
+    # --------------------------- asyncio engine ----------------------------
+    # Counterparts of the blocking IMAP operations for a session shared on the
+    # event loop (see AsyncImapEngine). They raise when the session fails, so
+    # the caller can retry on a fresh one.
+    async def fetch_messages_async(
+        self, conn: AsyncImapConnection, uids: Sequence[int], folder: str = "INBOX", limit: int = 50
+    ) -> list[MailMessage]:
+        """Asyncio version of :meth:`fetch_messages`."""
+        if not uids:
+            return []
+        async with self._sync_lock, conn.lock:
+            cache = self._cache_for(folder, limit)
+            wanted = sorted((uid for uid in set(uids) if uid not in cache), reverse=True)
+            await self._select_async(conn, folder)
+            return self._add_envelopes(folder, cache, await self._fetch_envelopes_async(conn, wanted))
+
+    async def push_flags_async(
+        self, conn: AsyncImapConnection, message: MailMessage, seen: bool = False, flagged: bool = False
+    ) -> None:
+        """Asyncio version of :meth:`push_flags`."""
+        self._persist_flags([message])
+        async with conn.lock:
+            await self._select_async(conn, message.folder)
+            stores = _flag_stores(message, seen, flagged)
+            await conn.pipeline(f"UID STORE {message.uid} {operation} {flags}" for operation, flags in stores)
+
+    async def fetch_message_body_async(self, conn: AsyncImapConnection, message: MailMessage) -> str:
+        """Asyncio version of :meth:`fetch_message_body` for a message :meth:`known_body` has no text for."""
+        async with conn.lock:
+            await self._select_async(conn, message.folder)
+            reply = await conn.command(f"UID FETCH {message.uid} (UID BODY.PEEK[])")
+        return self._keep_body(message, _body_in(parse_fetch_response(reply.data("FETCH"))) if reply.ok else None)
+
+    async def move_to_junk_async(self, conn: AsyncImapConnection, messages: Sequence[MailMessage]) -> list[MailMessage]:
+        """Asyncio version of :meth:`move_to_junk`."""
+        if not messages:
+            return []
+        async with self._sync_lock, conn.lock:
+            if self._junk_folder is None:
+                reply = await conn.command('LIST "" "*"')
+                self._junk_folder = _junk_folder_in(reply.data("LIST") if reply.ok else [])
+            junk = self._junk_folder
+            if not junk:
+                return []
+            target = _quote_mailbox(junk)
+            moved: list[MailMessage] = []
+            for folder, group in _by_folder(messages, junk).items():
+                reply = await conn.select(folder)
+                if not reply.ok:
+                    continue
+                uid_set = format_uid_set(sorted(message.uid for message in group))
+                if "MOVE" in conn.capabilities:
+                    reply = await conn.command(f"UID MOVE {uid_set} {target}")
+                else:
+                    reply = await conn.command(f"UID COPY {uid_set} {target}")
+                    if reply.ok:
+                        await conn.command(f"UID STORE {uid_set} +FLAGS.SILENT (\\Deleted)")
+                        await conn.command(f"UID EXPUNGE {uid_set}" if "UIDPLUS" in conn.capabilities else "EXPUNGE")
+                if not reply.ok:
+                    continue
+                self._expunge(self._folder_cache.get(folder, {}), [message.uid for message in group])
+                moved.extend(group)
+            return moved
+
+    async def fetch_older_async(
+        self, conn: AsyncImapConnection, folder: str = "INBOX", limit: int = 50
+    ) -> list[MailMessage] | None:
+        """Asyncio version of :meth:`fetch_older`."""
+        if self._store is None:
+            return []
+        async with self._sync_lock, conn.lock:
+            lowest = self._store.lowest_uid(self.account.key, folder)
+            if lowest <= 1:
+                return [] if lowest else None
+            reply = await conn.select(folder)
+            state = self._sync_state.get(self.account.key, folder)
+            if not reply.ok or reply.code("UIDVALIDITY") != state.uidvalidity:
+                return None
+            search = await conn.command(f"UID SEARCH UID 1:{lowest - 1}")
+            older = search.search_uids()[-limit:] if search.ok and limit > 0 else []
+            records = await self._fetch_envelopes_async(conn, list(reversed(older)))
+            fetched = [
+                self._message_from_envelope(record, folder)
+                for record in records
+                if record.section("BODY[HEADER") is not None
+            ]
+            self._store.upsert_messages(fetched)
+            return fetched
+
+    # ------------------------------- IMAP ----------------------------------
+    def _fetch_imap(self, limit: int) -> Sequence[MailMessage]:
+        return self._pool.run(lambda conn: self._sync_folder(conn, "INBOX", limit))
+
+    def _uid_fetch_batches(
+        self, conn: PooledConnection, uids: Sequence[int], items: str
+    ) -> Iterator[tuple[Sequence[int], list[FetchRecord]]]:
+        """Issue one ``UID FETCH`` per chunk of ``uids`` and yield ``(chunk, records)``.
+
+        Chunks keep the order of ``uids``; records inside a chunk follow that
+        order too (servers answer in mailbox order regardless of the set).
+        Chunks the server refused are skipped.
+        """
+        chunk_size = max(1, self.account.fetch_chunk_size)
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start : start + chunk_size]
+            typ, data = conn.client.uid("FETCH", format_uid_set(chunk), items)
+            if typ != "OK":
+                continue
+            yield chunk, _in_chunk_order(chunk, parse_fetch_response(data))
+
+    def _move_to_junk_on(self, conn: PooledConnection, messages: Sequence[MailMessage]) -> list[MailMessage]:
+        junk = self._find_junk_folder(conn)
+        if not junk:
+            return []
+        client = conn.client
+        target = _quote_mailbox(junk)
+        moved: list[MailMessage] = []
+        with self._sync_lock:
+            for folder, group in _by_folder(messages, junk).items():
+                typ, _ = conn.select(folder)
+                if typ != "OK":
+                    continue
+                uid_set = format_uid_set(sorted(message.uid for message in group))
+                if "MOVE" in client.capabilities:
+                    typ, _ = client.uid("MOVE", uid_set, target)
+                else:
+                    typ, _ = client.uid("COPY", uid_set, target)
+                    if typ == "OK":
+                        client.uid("STORE", uid_set, "+FLAGS.SILENT", "(\\Deleted)")
+                        if "UIDPLUS" in client.capabilities:
+                            client.uid("EXPUNGE", uid_set)
+                        else:
+                            client.expunge()
+                if typ != "OK":
+                    continue
+                self._expunge(self._folder_cache.get(folder, {}), [message.uid for message in group])
+                moved.extend(group)
+        return moved
+
+    def _find_junk_folder(self, conn: PooledConnection) -> str:
+        """Name of the Junk folder: the one flagged ``\\Junk``, else a conventional name."""
+        if self._junk_folder is None:
+            typ, data = conn.client.list()
+            self._junk_folder = _junk_folder_in(data if typ == "OK" and data else [])
+        return self._junk_folder
+
+    def _fetch_body_on(self, conn: PooledConnection, message: MailMessage) -> str | None:
+        conn.select(message.folder)
+        typ, msg_data = conn.client.uid("FETCH", str(message.uid), "(UID BODY.PEEK[])")
+        return _body_in(parse_fetch_response(msg_data)) if typ == "OK" else None
+
+    def _keep_body(self, message: MailMessage, body: str | None) -> str:
+        if body is not None:
+            message.body = body
+            if self._store is not None:
+                self._store.save_body(message.id, body)
+        return message.body or message.preview
+
+    def _message_from_envelope(self, record: FetchRecord, folder: str = "INBOX") -> MailMessage:
+        headers = email.message_from_bytes(record.section("BODY[HEADER") or b"")
+        subject = self._decode_header(headers.get("Subject", "(No subject)"))
+        sender = self._decode_header(headers.get("From", "Unknown sender"))
+        preview = self._preview_from_partial(headers, record.section("BODY[1.MIME]"), record.section("BODY[1]") or b"")
+        return MailMessage(
+            id=f"{self.account.key}:{folder}:{record.uid}",
+            account_id=self.account.key,
+            subject=subject,
+            sender=sender,
+            preview=preview,
+            date_received=self._parse_date(headers.get("Date")),
+            is_unread=not record.has_flag("\\Seen"),
+            is_flagged=record.has_flag("\\Flagged"),
+            is_answered=record.has_flag("\\Answered"),
+            folder=folder,
+            uid=record.uid or 0,
+        )
+
+    def _imap_flag(self, message: MailMessage, seen: bool = False, flagged: bool = False) -> None:
+        def operation(conn: PooledConnection) -> None:
+            conn.select(message.folder)
+            for store, flags in _flag_stores(message, seen, flagged):
+                conn.client.uid("STORE", str(message.uid), store, flags)
+
         try:
-            with imaplib.IMAP4_SSL(self.account.incoming_server, self.account.port) as client:
-                client.login(self.account.username or self.account.address, self.account.password or "")
-                client.select("INBOX")
-                msg_id = message.id.split(":")[-1]
-                if mark_read:
-                    client.store(msg_id, "+FLAGS", "(\\Seen)")
-                if toggle_star:
-                    if message.is_flagged:
-                        client.store(msg_id, "+FLAGS", "(\\Flagged)")
-                    else:
-                        client.store(msg_id, "-FLAGS", "(\\Flagged)")
+            self._pool.run(operation)
         except Exception:
             pass
 
+    # ----------------------------- sync engine -----------------------------
+    def _sync_folder(self, conn: PooledConnection, folder: str, limit: int) -> list[MailMessage]:
+        """Bring the cached window of ``folder`` up to date and return it, newest first.
+
+        UIDs stay valid for as long as UIDVALIDITY does, so once a window is
+        cached only UIDs at or above the stored UIDNEXT are downloaded. Known
+        messages are resynchronised by :meth:`_resync_known`.
+        """
+        with self._sync_lock:
+            client = conn.client
+            typ, _ = conn.select(folder, force=True)
+            if typ != "OK":
+                raise ConnectionError(f"cannot select {folder}")
+            uidvalidity = self._untagged_int(client, "UIDVALIDITY")
+            uidnext = self._untagged_int(client, "UIDNEXT")
+            highestmodseq = self._untagged_int(client, "HIGHESTMODSEQ")
+            state, cache = self._open_window(folder, limit, uidvalidity)
+            if cache:
+                self._resync_known(conn, cache, state, highestmodseq)
+            criteria, start = self._new_uid_query(cache, state, uidnext)
+            new_uids = [uid for uid in self._search_uids(client, criteria) if uid >= start] if criteria else []
+            new_uids = [uid for uid in new_uids[-limit:] if uid not in cache] if limit > 0 else []
+
+            for _chunk, batch in self._uid_fetch_batches(conn, list(reversed(new_uids)), ENVELOPE_FETCH_ITEMS):
+                self._add_envelopes(folder, cache, batch)
+            return self._close_window(folder, cache, state, limit, uidvalidity, uidnext, highestmodseq)
+
+    async def sync_folder_async(
+        self, conn: AsyncImapConnection, folder: str = "INBOX", limit: int = 50
+    ) -> list[MailMessage]:
+        """Asyncio version of the folder sync, for the shared IMAP event loop.
+
+        Follows the same steps and window helpers as :meth:`_sync_folder`
+        but pipelines the commands that don't depend on each other: the flag
+        resync and the search for new UIDs go out together, as do all
+        envelope fetch chunks.
+        """
+        async with self._sync_lock, conn.lock:
+            reply = await conn.select(folder)
+            if not reply.ok:
+                raise ConnectionError(f"cannot select {folder}")
+            uidvalidity = reply.code("UIDVALIDITY")
+            uidnext = reply.code("UIDNEXT")
+            highestmodseq = reply.code("HIGHESTMODSEQ")
+            state, cache = self._open_window(folder, limit, uidvalidity)
+            mode = self._resync_mode(conn.enabled, cache, state, highestmodseq)
+            criteria, start = self._new_uid_query(cache, state, uidnext)
+            commands: list[str] = []
+            if mode != RESYNC_NONE:
+                commands.append(f"UID FETCH {format_uid_set(cache)} (UID FLAGS){self._resync_modifier(mode, state)}")
+            if criteria:
+                commands.append(f"UID SEARCH {criteria}")
+            replies = await conn.pipeline(commands)
+
+            new_uids: list[int] = []
+            if criteria:
+                search = replies.pop()
+                new_uids = [uid for uid in search.search_uids() if uid >= start] if search.ok else []
+            if replies:
+                flags = replies[0]
+                records = list(parse_fetch_response(flags.data("FETCH")))
+                if mode == RESYNC_QRESYNC:
+                    gone = _vanished_uids(cache, flags.data("VANISHED"))
+                elif mode == RESYNC_CHANGEDSINCE:
+                    # Sent on its own: SEARCH results of pipelined commands can't be told apart.
+                    search = await conn.command(f"UID SEARCH UID {format_uid_set(cache)}")
+                    gone = _missing_uids(cache, search.search_uids()) if search.ok else []
+                else:
+                    gone = _missing_uids(cache, (record.uid for record in records)) if flags.ok else []
+                self._reconcile(cache, records, gone)
+
+            new_uids = list(reversed([uid for uid in new_uids[-limit:] if uid not in cache] if limit > 0 else []))
+            self._add_envelopes(folder, cache, await self._fetch_envelopes_async(conn, new_uids))
+            return self._close_window(folder, cache, state, limit, uidvalidity, uidnext, highestmodseq)
+
+    async def _fetch_envelopes_async(self, conn: AsyncImapConnection, uids: Sequence[int]) -> list[FetchRecord]:
+        """Envelopes of ``uids`` in that order, one pipelined ``UID FETCH`` per chunk."""
+        chunk_size = max(1, self.account.fetch_chunk_size)
+        chunks = [uids[index : index + chunk_size] for index in range(0, len(uids), chunk_size)]
+        fetches = await conn.pipeline(f"UID FETCH {format_uid_set(chunk)} {ENVELOPE_FETCH_ITEMS}" for chunk in chunks)
+        return [
+            record
+            for chunk, fetch in zip(chunks, fetches)
+            if fetch.ok
+            for record in _in_chunk_order(chunk, parse_fetch_response(fetch.data("FETCH")))
+        ]
+
+    @staticmethod
+    async def _select_async(conn: AsyncImapConnection, folder: str) -> None:
+        if conn.mailbox != folder and not (await conn.select(folder)).ok:
+            raise ConnectionError(f"cannot select {folder}")
+
+    def _open_window(self, folder: str, limit: int, uidvalidity: int) -> tuple[FolderSyncState, dict[int, MailMessage]]:
+        """Load the checkpoint and cached window, dropping both if UIDVALIDITY changed."""
+        state = self._sync_state.get(self.account.key, folder)
+        cache = self._cache_for(folder, limit)
+        if state.uidvalidity != uidvalidity:
+            cache.clear()
+            if self._store is not None:
+                self._store.delete_folder(self.account.key, folder)
+        return state, cache
+
+    @staticmethod
+    def _new_uid_query(cache: dict[int, MailMessage], state: FolderSyncState, uidnext: int) -> tuple[str | None, int]:
+        """``UID SEARCH`` criteria for mail that arrived since the last sync, or ``None`` when there is none.
+
+        The search starts at the checkpoint's UIDNEXT, not above the newest
+        cached UID: IDLE adds new mail to the window between syncs, and mail
+        that arrived just before it started listening would otherwise be
+        skipped. Callers leave out the UIDs already in the window.
+        """
+        if not cache or not state.uidnext:
+            return "ALL", 0
+        if uidnext and uidnext == state.uidnext:
+            return None, 0
+        return f"UID {state.uidnext}:*", state.uidnext
+
+    def _add_envelopes(
+        self, folder: str, cache: dict[int, MailMessage], records: Iterable[FetchRecord]
+    ) -> list[MailMessage]:
+        parsed = [
+            self._message_from_envelope(record, folder)
+            for record in records
+            if record.section("BODY[HEADER") is not None
+        ]
+        for message in parsed:
+            cache[message.uid] = message
+        if self._store is not None:
+            self._store.upsert_messages(parsed)
+        return parsed
+
+    def _close_window(
+        self,
+        folder: str,
+        cache: dict[int, MailMessage],
+        state: FolderSyncState,
+        limit: int,
+        uidvalidity: int,
+        uidnext: int,
+        highestmodseq: int,
+    ) -> list[MailMessage]:
+        """Trim the window to ``limit``, save the checkpoint and return the window newest first."""
+        for uid in sorted(cache)[:-limit] if limit > 0 else list(cache):
+            del cache[uid]
+        state.uidvalidity = uidvalidity
+        state.uidnext = uidnext or max(cache, default=0) + 1
+        state.highestmodseq = highestmodseq
+        self._sync_state.put(self.account.key, state)
+        return [cache[uid] for uid in sorted(cache, reverse=True)]
+
+    def _resync_known(
+        self, conn: PooledConnection, cache: dict[int, MailMessage], state: FolderSyncState, highestmodseq: int
+    ) -> None:
+        """Apply flag changes and expunges for the cached window; see :meth:`_resync_mode`."""
+        mode = self._resync_mode(conn.enabled, cache, state, highestmodseq)
+        if mode == RESYNC_NONE:
+            return
+        if mode == RESYNC_FULL:
+            self._refresh_known_flags(conn, cache)
+            return
+        client = conn.client
+        typ, data = client.uid("FETCH", format_uid_set(cache), "(UID FLAGS)" + self._resync_modifier(mode, state))
+        if typ != "OK":
+            self._refresh_known_flags(conn, cache)
+            return
+        if mode == RESYNC_QRESYNC:
+            gone = _vanished_uids(cache, client.response("VANISHED")[1] or [])
+        else:
+            gone = _missing_uids(cache, self._search_uids(client, f"UID {format_uid_set(cache)}"))
+        self._reconcile(cache, parse_fetch_response(data), gone)
+
+    @staticmethod
+    def _resync_mode(
+        enabled: Iterable[str], cache: dict[int, MailMessage], state: FolderSyncState, highestmodseq: int
+    ) -> str:
+        """How to bring a cached window up to date, one of the ``RESYNC_*`` modes.
+
+        With CONDSTORE the server tells us whether anything changed at all
+        (HIGHESTMODSEQ) and only returns messages modified since our
+        checkpoint; QRESYNC additionally reports expunged UIDs as VANISHED.
+        Without either, every cached message's flags are fetched again.
+        """
+        if not cache:
+            return RESYNC_NONE
+        if "CONDSTORE" not in enabled or not highestmodseq or not state.highestmodseq:
+            return RESYNC_FULL
+        if highestmodseq == state.highestmodseq:
+            return RESYNC_NONE
+        return RESYNC_QRESYNC if "QRESYNC" in enabled else RESYNC_CHANGEDSINCE
+
+    @staticmethod
+    def _resync_modifier(mode: str, state: FolderSyncState) -> str:
+        """``UID FETCH`` modifier (with a leading space) for ``mode``; empty for a full refetch."""
+        if mode == RESYNC_QRESYNC:
+            return f" (CHANGEDSINCE {state.highestmodseq} VANISHED)"
+        if mode == RESYNC_CHANGEDSINCE:
+            return f" (CHANGEDSINCE {state.highestmodseq})"
+        return ""
+
+    def _reconcile(self, cache: dict[int, MailMessage], records: Iterable[FetchRecord], gone: Iterable[int]) -> None:
+        """Apply the flags in ``records`` to the window, save what changed and expunge ``gone``."""
+        changed = [
+            message
+            for record in records
+            if (message := cache.get(record.uid or 0)) is not None and self._apply_flags(message, record)
+        ]
+        self._persist_flags(changed)
+        self._expunge(cache, gone)
+
+    def _fetch_uids_on(
+        self, conn: PooledConnection, folder: str, uids: Sequence[int], limit: int
+    ) -> list[MailMessage]:
+        with self._sync_lock:
+            cache = self._cache_for(folder, limit)
+            wanted = sorted((uid for uid in set(uids) if uid not in cache), reverse=True)
+            conn.select(folder)
+            fetched: list[MailMessage] = []
+            for _chunk, batch in self._uid_fetch_batches(conn, wanted, ENVELOPE_FETCH_ITEMS):
+                for record in batch:
+                    if record.section("BODY[HEADER") is None:
+                        continue
+                    message = self._message_from_envelope(record, folder)
+                    cache[message.uid] = message
+                    fetched.append(message)
+            if self._store is not None:
+                self._store.upsert_messages(fetched)
+            return fetched
+
+    def _fetch_older_on(self, conn: PooledConnection, folder: str, limit: int) -> list[MailMessage] | None:
+        with self._sync_lock:
+            lowest = self._store.lowest_uid(self.account.key, folder) if self._store is not None else 0
+            if lowest == 0:
+                return None
+            if lowest == 1:
+                return []
+            client = conn.client
+            typ, _ = conn.select(folder, force=True)
+            state = self._sync_state.get(self.account.key, folder)
+            if typ != "OK" or self._untagged_int(client, "UIDVALIDITY") != state.uidvalidity:
+                # The next sync notices the new UIDVALIDITY and starts the folder over.
+                return None
+            older = self._search_uids(client, f"UID 1:{lowest - 1}")[-limit:] if limit > 0 else []
+            fetched: list[MailMessage] = []
+            for _chunk, batch in self._uid_fetch_batches(conn, list(reversed(older)), ENVELOPE_FETCH_ITEMS):
+                fetched.extend(
+                    self._message_from_envelope(record, folder)
+                    for record in batch
+                    if record.section("BODY[HEADER") is not None
+                )
+            # Older mail goes to the store only; the in-memory window keeps the newest messages.
+            if self._store is not None:
+                self._store.upsert_messages(fetched)
+            return fetched
+
+    def _refresh_known_flags(self, conn: PooledConnection, cache: dict[int, MailMessage]) -> None:
+        checked: set[int] = set()
+        records: list[FetchRecord] = []
+        for chunk, batch in self._uid_fetch_batches(conn, sorted(cache), "(UID FLAGS)"):
+            checked.update(chunk)
+            records.extend(batch)
+        self._reconcile(cache, records, checked.difference(record.uid for record in records))
+
+    def _cache_for(self, folder: str, limit: int = 0) -> dict[int, MailMessage]:
+        """Return the in-memory window for ``folder``, warming it from the store on first use."""
+        cache = self._folder_cache.get(folder)
+        if cache is None:
+            cache = self._folder_cache[folder] = {}
+            if self._store is not None and limit > 0:
+                for message in self._store.load_messages(self.account.key, folder, limit, include_spam=True):
+                    cache[message.uid] = message
+        return cache
+
+    def _expunge(self, cache: dict[int, MailMessage], uids: Iterable[int]) -> None:
+        removed = [cache.pop(uid) for uid in list(uids) if uid in cache]
+        if self._store is not None and removed:
+            self._store.delete_messages([message.id for message in removed])
+
+    def _persist_flags(self, messages: Sequence[MailMessage]) -> None:
+        if self._store is not None and messages:
+            self._store.update_flags(messages)
+
+    @staticmethod
+    def _apply_flags(message: MailMessage, record: FetchRecord) -> bool:
+        is_unread = not record.has_flag("\\Seen")
+        is_flagged = record.has_flag("\\Flagged")
+        message.is_answered = record.has_flag("\\Answered")
+        if (message.is_unread, message.is_flagged) == (is_unread, is_flagged):
+            return False
+        message.is_unread = is_unread
+        message.is_flagged = is_flagged
+        return True
+
+    @staticmethod
+    def _search_uids(client, criteria: str) -> list[int]:
+        typ, data = client.uid("SEARCH", None, criteria)
+        if typ != "OK" or not data or not data[0]:
+            return []
+        return sorted(int(uid) for uid in data[0].split())
+
+    @staticmethod
+    def _untagged_int(client, name: str) -> int:
+        _typ, data = client.response(name)
+        for value in reversed(data or []):
+            if not value:
+                continue
+            try:
+                return int(value.split()[0])
+            except (ValueError, IndexError):
+                continue
+        return 0
+
     # ----------------------------- sample data -----------------------------
     def _load_sample_messages(self) -> list[MailMessage]:
         if self._sample_messages is None:
@@ -147,7 +748,7 @@ class MailClient:
                 messages.append(
                     MailMessage(
                         id=f"sample:{entry['id']}",
-                        account_id=self.account.address,
+                        account_id=self.account.key,
                         subject=entry["subject"],
                         sender=entry["sender"],
                         preview=entry["preview"],
@@ -173,7 +774,21 @@ class MailClient:
         return " ".join(parts)
 
     @staticmethod
-    def _extract_preview(message: Message) -> str:
+    def _parse_date(value: str | None) -> datetime:
+        if value:
+            try:
+                parsed = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                parsed = None
+            if parsed is not None:
+                if parsed.tzinfo is None:
+                    parsed = parsed.replace(tzinfo=timezone.utc)
+                return parsed.astimezone(timezone.utc)
+        # Whole seconds like header dates, so the key survives a MessageTable's integer timestamps.
+        return datetime.now(timezone.utc).replace(microsecond=0)
+
+    @staticmethod
+    def _extract_text(message: Message) -> str:
         body = ""
         if message.is_multipart():
             for part in message.walk():
@@ -187,8 +802,109 @@ class MailClient:
             payload = message.get_payload(decode=True)
             if payload:
                 body = payload.decode(message.get_content_charset() or "utf8", errors="replace")
-        body = body.strip().replace("\n", " ")
-        return body[:200]
+                if message.get_content_type() == "text/html":
+                    body = html.unescape(_TAG_RE.sub(" ", body))
+        return body.strip().replace("\r\n", "\n")
+
+    @classmethod
+    def _preview_from_partial(cls, headers: Message, part_headers: bytes | None, partial: bytes) -> str:
+        """Turn the first bytes of body part 1 into a short preview.
+
+        Single-part messages are decoded as their top-level headers declare,
+        multipart ones as the ``BODY[1.MIME]`` headers of part 1 declare. When
+        part 1 is itself multipart, its first child's headers are still inline
+        after the boundary and are read from there.
+        """
+        if headers.get_content_maintype() == "multipart":
+            headers = email.message_from_bytes(part_headers or b"")
+        if headers.get_content_maintype() == "multipart":
+            marker = b"--" + (headers.get_boundary() or "").encode()
+            rest = partial.partition(marker)[2].partition(b"\n")[2]
+            nested_headers, _, payload = rest.replace(b"\r\n", b"\n").partition(b"\n\n")
+            payload = payload.split(b"\n" + marker, 1)[0]
+            return cls._decode_partial(payload, email.message_from_bytes(nested_headers))
+        return cls._decode_partial(partial, headers)
+
+    @staticmethod
+    def _decode_partial(payload: bytes, headers: Message) -> str:
+        encoding = headers.get("Content-Transfer-Encoding", "7bit").strip().lower()
+        if encoding == "base64":
+            compact = b"".join(payload.split())
+            try:
+                payload = base64.b64decode(compact[: len(compact) - len(compact) % 4])
+            except (binascii.Error, ValueError):
+                pass
+        elif encoding == "quoted-printable":
+            payload = quopri.decodestring(payload)
+        text = payload.decode(headers.get_content_charset() or "utf8", errors="replace")
+        if headers.get_content_subtype() == "html":
+            text = html.unescape(_TAG_RE.sub(" ", text))
+        return " ".join(text.split())[:PREVIEW_LENGTH]
+
+
+def _in_chunk_order(chunk: Sequence[int], records: Iterable[FetchRecord]) -> list[FetchRecord]:
+    """Records for the UIDs in ``chunk``, in ``chunk``'s order (servers answer in mailbox order)."""
+    position = {uid: index for index, uid in enumerate(chunk)}
+    ordered = [record for record in records if record.uid in position]
+    ordered.sort(key=lambda record: position[record.uid])
+    return ordered
+
+
+def _vanished_uids(cache: dict[int, MailMessage], values: Iterable[ResponseEntry | None]) -> list[int]:
+    """Cached UIDs covered by the ranges of QRESYNC ``VANISHED`` responses."""
+    ranges = [span for value in values if isinstance(value, bytes) and value for span in parse_uid_ranges(value)]
+    return [uid for uid in cache if any(low <= uid <= high for low, high in ranges)]
+
+
+def _missing_uids(cache: dict[int, MailMessage], present: Iterable[int | None]) -> list[int]:
+    """Cached UIDs the server no longer lists."""
+    remaining = set(present)
+    return [uid for uid in cache if uid not in remaining]
+
+
+def _quote_mailbox(name: str) -> str:
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _flag_stores(message: MailMessage, seen: bool, flagged: bool) -> list[tuple[str, str]]:
+    """``UID STORE`` operations and flag lists for a :meth:`MailClient.push_flags` call."""
+    stores = [("+FLAGS.SILENT", "(\\Seen)")] if seen else []
+    if flagged:
+        stores.append(("+FLAGS.SILENT" if message.is_flagged else "-FLAGS.SILENT", "(\\Flagged)"))
+    return stores
+
+
+def _body_in(records: Iterable[FetchRecord]) -> str | None:
+    for record in records:
+        raw_email = record.section("BODY[]")
+        if raw_email is not None:
+            return MailClient._extract_text(email.message_from_bytes(raw_email))
+    return None
+
+
+def _by_folder(messages: Sequence[MailMessage], junk: str) -> dict[str, list[MailMessage]]:
+    """``messages`` that can move to ``junk``, grouped by the folder they are in."""
+    by_folder: dict[str, list[MailMessage]] = {}
+    for message in messages:
+        if message.uid and message.folder != junk:
+            by_folder.setdefault(message.folder, []).append(message)
+    return by_folder
+
+
+def _junk_folder_in(lines: Iterable[ResponseEntry]) -> str:
+    """The Junk folder named in ``LIST`` data; see :meth:`MailClient._find_junk_folder`."""
+    names: dict[str, str] = {}
+    for line in lines:
+        match = _LIST_RE.match(line) if isinstance(line, bytes) else None
+        if match is None:
+            continue
+        name = match.group("name").decode("utf8", "replace").strip()
+        if len(name) > 1 and name[0] == name[-1] == '"':
+            name = name[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        if b"\\junk" in match.group("flags").lower():
+            return name
+        names[name.lower()] = name
+    return next((names[name.lower()] for name in JUNK_FOLDER_NAMES if name.lower() in names), "")
 
 
 __all__ = ["MailClient", "MailFolder", "MailMessage"]
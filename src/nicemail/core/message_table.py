@@ -0,0 +1,298 @@
+"""Column-oriented storage for long message lists."""
+from __future__ import annotations
+
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Mapping, Sequence
+
+from .mail_client import MailMessage
+
+FLAG_UNREAD = 1
+FLAG_FLAGGED = 2
+FLAG_ANSWERED = 4
+FLAG_SPAM_PENDING = 8
+
+# message ids -> {id: preview}; fills in the previews a table is built without.
+PreviewLoader = Callable[[Sequence[str]], Mapping[str, str]]
+
+
+class StringPool:
+    """Intern repeated strings (account ids, folders, senders) as small integers.
+
+    Tables filled on worker threads share one pool with the table the UI
+    reads, so their rows can be copied across without translating numbers.
+    """
+
+    __slots__ = ("_lock", "_numbers", "_values")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._numbers: dict[str, int] = {}
+        self._values: list[str] = []
+
+    def add(self, value: str) -> int:
+        number = self._numbers.get(value)
+        if number is None:
+            with self._lock:
+                number = self._numbers.get(value)
+                if number is None:
+                    number = len(self._values)
+                    self._values.append(value)
+                    self._numbers[value] = number
+        return number
+
+    def __getitem__(self, number: int) -> str:
+        return self._values[number]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class MessageTable:
+    """Message summaries stored column by column, for lists of many thousand rows.
+
+    A :class:`MailMessage` costs several hundred bytes: its own ``datetime``,
+    a string object per field and a copy of the account id. Here a row is a
+    few array slots: epoch seconds, UID, flag bits and numbers into a
+    :class:`StringPool` for account, folder and sender. Subjects are packed
+    as UTF-8 into one buffer, and ids are only kept when they do not follow
+    the ``account:folder:uid`` pattern the IMAP client uses.
+
+    Previews are not part of the rows. They come in blocks through
+    ``preview_loader`` when first read and are dropped again once enough
+    other blocks were read since. The UI thread must not wait for the
+    loader, so it reads with ``load=False`` and fills missing blocks from a
+    worker with :meth:`missing_previews` and :meth:`add_previews`.
+    :meth:`message` builds a :class:`MailMessage` for code that needs the
+    object itself.
+    """
+
+    PREVIEW_BLOCK = 64
+    RESIDENT_PREVIEW_BLOCKS = 16
+
+    def __init__(self, pool: StringPool | None = None, preview_loader: PreviewLoader | None = None) -> None:
+        self.pool = pool if pool is not None else StringPool()
+        self.preview_loader = preview_loader
+        self._received = array("q")
+        self._uids = array("I")
+        self._accounts = array("I")
+        self._folders = array("I")
+        self._senders = array("I")
+        self._flags = array("B")
+        self._subjects = bytearray()
+        self._subject_ends = array("Q")
+        # Rows whose id cannot be derived from account, folder and UID (e.g. sample mail).
+        self._ids: dict[int, str] = {}
+        # Preview blocks by number, least recently read first.
+        self._previews: dict[int, list[str | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    # ------------------------------ building -------------------------------
+    def append_row(
+        self,
+        message_id: str,
+        account_id: str,
+        folder: str,
+        uid: int,
+        subject: str,
+        sender: str,
+        received: float,
+        flags: int,
+    ) -> None:
+        """Add one row; ``received`` is an epoch timestamp, ``flags`` a mix of the ``FLAG_*`` bits."""
+        row = len(self._flags)
+        self._received.append(int(received))
+        self._uids.append(uid)
+        self._accounts.append(self.pool.add(account_id))
+        self._folders.append(self.pool.add(folder))
+        self._senders.append(self.pool.add(sender))
+        self._subjects += subject.encode("utf8", "surrogatepass")
+        self._subject_ends.append(len(self._subjects))
+        self._flags.append(flags)
+        if message_id != f"{account_id}:{folder}:{uid}":
+            self._ids[row] = message_id
+
+    def append(self, message: MailMessage) -> None:
+        """Add ``message`` as a row, keeping its preview until that block is dropped."""
+        row = len(self._flags)
+        self.append_row(
+            message.id,
+            message.account_id,
+            message.folder,
+            message.uid,
+            message.subject,
+            message.sender,
+            message.date_received.timestamp(),
+            _flags_of(message),
+        )
+        self._set_preview(row, message.preview)
+
+    def extend(self, other: MessageTable, rows: Iterable[int] | None = None) -> None:
+        """Copy ``rows`` of ``other`` (all by default), which must share this table's pool.
+
+        Previews ``other`` holds are copied too.
+        """
+        if other.pool is not self.pool:
+            raise ValueError("tables must share a string pool")
+        if rows is None:
+            rows = range(len(other))
+        for row in rows:
+            preview = other.preview(row, load=False)
+            if preview is not None:
+                self._set_preview(len(self._flags), preview)
+            self.append_row(
+                other.id(row),
+                other.account_id(row),
+                other.folder(row),
+                other._uids[row],
+                other.subject(row),
+                other.sender(row),
+                other._received[row],
+                other._flags[row],
+            )
+        self._evict_previews()
+
+    # ------------------------------ reading --------------------------------
+    def id(self, row: int) -> str:
+        message_id = self._ids.get(row)
+        if message_id is None:
+            pool = self.pool
+            message_id = f"{pool[self._accounts[row]]}:{pool[self._folders[row]]}:{self._uids[row]}"
+        return message_id
+
+    def account_id(self, row: int) -> str:
+        return self.pool[self._accounts[row]]
+
+    def folder(self, row: int) -> str:
+        return self.pool[self._folders[row]]
+
+    def sender(self, row: int) -> str:
+        return self.pool[self._senders[row]]
+
+    def subject(self, row: int) -> str:
+        start = self._subject_ends[row - 1] if row else 0
+        return self._subjects[start : self._subject_ends[row]].decode("utf8", "surrogatepass")
+
+    def timestamp(self, row: int) -> int:
+        return self._received[row]
+
+    def flags(self, row: int) -> int:
+        return self._flags[row]
+
+    def key(self, row: int) -> tuple[float, str]:
+        """The row's position in the store's newest-first order (see :func:`~nicemail.core.store.message_key`)."""
+        return (float(self._received[row]), self.id(row))
+
+    def preview(self, row: int, load: bool = True) -> str | None:
+        """Preview of ``row``; with ``load=False``, ``None`` when it would have to be loaded first."""
+        number, position = divmod(row, self.PREVIEW_BLOCK)
+        block = self._previews.pop(number, None)
+        if block is not None:
+            self._previews[number] = block
+        if block is None or position >= len(block) or block[position] is None:
+            if not load:
+                return None
+            missing = self.missing_previews(number)
+            self.add_previews(number, self.preview_loader(missing) if self.preview_loader is not None else {})
+            block = self._previews[number]
+        return block[position] or ""
+
+    def preview_block(self, row: int) -> int:
+        """Number of the preview block holding ``row``."""
+        return row // self.PREVIEW_BLOCK
+
+    def block_rows(self, number: int) -> range:
+        first = number * self.PREVIEW_BLOCK
+        return range(first, min(first + self.PREVIEW_BLOCK, len(self._flags)))
+
+    def missing_previews(self, number: int) -> list[str]:
+        """Ids of the rows in block ``number`` whose preview is not held; pass them to the loader."""
+        block = self._previews.get(number) or []
+        first = number * self.PREVIEW_BLOCK
+        return [
+            self.id(row)
+            for row in self.block_rows(number)
+            if row - first >= len(block) or block[row - first] is None
+        ]
+
+    def add_previews(self, number: int, previews: Mapping[str, str]) -> None:
+        """Fill block ``number`` from ``previews`` (by id, as the loader returns them); absent ids get none."""
+        block = self._previews.pop(number, None)
+        first = number * self.PREVIEW_BLOCK
+        rows = self.block_rows(number)
+        block = list(block or [])
+        block.extend([None] * (len(rows) - len(block)))
+        for row in rows:
+            if block[row - first] is None:
+                block[row - first] = previews.get(self.id(row), "")
+        self._previews[number] = block
+        self._evict_previews()
+
+    def load_previews(self) -> None:
+        """Read every missing preview now, e.g. on a worker thread before the table reaches the UI."""
+        if self.preview_loader is None:
+            return
+        for number in range(0, (len(self._flags) + self.PREVIEW_BLOCK - 1) // self.PREVIEW_BLOCK):
+            missing = self.missing_previews(number)
+            if missing:
+                self.add_previews(number, self.preview_loader(missing))
+
+    def message(self, row: int, load_preview: bool = True) -> MailMessage:
+        """Build the :class:`MailMessage` for ``row``; changing it does not change the table.
+
+        With ``load_preview=False`` a preview that is not held is left empty.
+        """
+        flags = self._flags[row]
+        return MailMessage(
+            id=self.id(row),
+            account_id=self.account_id(row),
+            subject=self.subject(row),
+            sender=self.sender(row),
+            preview=self.preview(row, load_preview) or "",
+            date_received=datetime.fromtimestamp(self._received[row], tz=timezone.utc),
+            is_unread=bool(flags & FLAG_UNREAD),
+            is_flagged=bool(flags & FLAG_FLAGGED),
+            is_answered=bool(flags & FLAG_ANSWERED),
+            folder=self.folder(row),
+            uid=self._uids[row],
+            spam_pending=bool(flags & FLAG_SPAM_PENDING),
+        )
+
+    def update_flags(self, row: int, message: MailMessage) -> None:
+        """Take over the read, flagged, answered and spam-pending state of ``message``."""
+        self._flags[row] = _flags_of(message)
+
+    # ------------------------------ helpers --------------------------------
+    def _set_preview(self, row: int, preview: str) -> None:
+        number, position = divmod(row, self.PREVIEW_BLOCK)
+        block = self._previews.setdefault(number, [])
+        block.extend([None] * (position + 1 - len(block)))
+        block[position] = preview
+
+    def _evict_previews(self) -> None:
+        if self.preview_loader is not None:
+            while len(self._previews) > self.RESIDENT_PREVIEW_BLOCKS:
+                del self._previews[next(iter(self._previews))]
+
+
+def _flags_of(message: MailMessage) -> int:
+    return (
+        (FLAG_UNREAD if message.is_unread else 0)
+        | (FLAG_FLAGGED if message.is_flagged else 0)
+        | (FLAG_ANSWERED if message.is_answered else 0)
+        | (FLAG_SPAM_PENDING if message.spam_pending else 0)
+    )
+
+
+__all__ = [
+    "FLAG_ANSWERED",
+    "FLAG_FLAGGED",
+    "FLAG_SPAM_PENDING",
+    "FLAG_UNREAD",
+    "MessageTable",
+    "PreviewLoader",
+    "StringPool",
+]
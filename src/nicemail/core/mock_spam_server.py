@@ -0,0 +1,180 @@
+"""Local stand-in for a spam provider, to benchmark and tune classification offline.
+
+Run ``python -m nicemail.core.mock_spam_server --latency 0.4 --error-rate 0.05``
+and point NiceMail at it::
+
+    [spam]
+    provider = "openai-compatible"   # or "chatgpt" for the Responses API shape
+    base_url = "http://127.0.0.1:8765/v1"
+    api_key = "test"
+
+Both ``/v1/responses`` and ``/v1/chat/completions`` are served. Verdicts
+come from the built-in rules, so results are deterministic; latency, server
+errors and throttling are simulated at the configured rates.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .mail_client import MailMessage
+from .spam_providers import rule_score
+
+
+class MockSpamServer:
+    """Serve fake classifications on ``host:port`` from a background thread."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        latency: float = 0.2,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="nicemail-mock-spam", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    # ------------------------------ handlers -------------------------------
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:  # noqa: N802
+                with server._lock:
+                    server.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._reply(400, {"error": "invalid JSON"})
+                    return
+                time.sleep(max(server.latency + random.uniform(-server.jitter, server.jitter), 0.0))
+                roll = random.random()
+                if roll < server.throttle_rate:
+                    self._reply(429, {"error": "rate limited"}, {"Retry-After": f"{server.retry_after:g}"})
+                elif roll < server.throttle_rate + server.error_rate:
+                    self._reply(500, {"error": "simulated failure"})
+                elif self.path.rstrip("/").endswith("/responses"):
+                    self._reply(200, _responses_reply(payload))
+                elif self.path.rstrip("/").endswith("/chat/completions"):
+                    self._reply(200, _chat_reply(payload))
+                else:
+                    self._reply(404, {"error": f"unknown endpoint {self.path}"})
+
+            def log_message(self, format: str, *args) -> None:  # noqa: A002
+                return
+
+            def _reply(self, status: int, body: dict, headers: dict[str, str] | None = None) -> None:
+                data = json.dumps(body).encode("utf8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+# ------------------------------ helpers --------------------------------
+def _verdict(message_id: str, prompt: str) -> dict:
+    fields = dict(line.partition(": ")[::2] for line in prompt.splitlines() if ": " in line)
+    message = MailMessage(
+        id=message_id,
+        account_id="mock",
+        subject=fields.get("Subject", ""),
+        sender=fields.get("From", ""),
+        preview=fields.get("Preview", ""),
+        date_received=datetime.now(timezone.utc),
+    )
+    score = rule_score(message)
+    return {"is_spam": score >= 0.5, "confidence": round(max(score, 1.0 - score), 3)}
+
+
+def _responses_reply(payload: dict) -> dict:
+    choices = []
+    for item in payload.get("input", []):
+        message_id = item.get("metadata", {}).get("message_id")
+        text = "".join(part.get("text", "") for part in item.get("content", []))
+        if message_id:
+            choices.append(
+                {
+                    "metadata": {"message_id": message_id},
+                    "content": [{"type": "output_text", "text": json.dumps(_verdict(message_id, text))}],
+                }
+            )
+    return {"choices": choices}
+
+
+def _chat_reply(payload: dict) -> dict:
+    user = next((m.get("content", "") for m in payload.get("messages", []) if m.get("role") == "user"), "")
+    verdicts = []
+    for block in user.split("\n\n"):
+        head, _, prompt = block.partition("\n")
+        if head.startswith("Email id: "):
+            message_id = head[len("Email id: ") :].strip()
+            verdicts.append({"id": message_id, **_verdict(message_id, prompt)})
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(verdicts)}}]}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Local stand-in spam provider for NiceMail benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean response delay in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform +/- variation of the delay.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429.")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s.")
+    args = parser.parse_args(argv)
+    server = MockSpamServer(
+        args.host, args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after
+    )
+    print(f"Mock spam provider listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+__all__ = ["MockSpamServer", "main"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+"""Rate limiting, backoff and circuit breaking for remote providers."""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider that is throttled or known to be down."""
+
+
+class TokenBucket:
+    """Allow ``rate`` calls per second on average with bursts up to ``capacity``.
+
+    :meth:`pause` empties the bucket for a while, which is how a server's
+    ``Retry-After`` is honoured by every caller sharing the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = max(rate, 1e-6)
+        self._capacity = max(capacity, 1.0)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting at most ``timeout`` seconds; False when none came free."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                    self._updated = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return True
+                    ready_at = now + (1.0 - self._tokens) / self._rate
+                else:
+                    ready_at = self._paused_until
+            if ready_at > deadline:
+                return False
+            time.sleep(max(ready_at - time.monotonic(), 0.0))
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # One call may go through as soon as the pause ends; the rest refill at ``rate``.
+            self._tokens = 1.0
+            self._updated = self._paused_until
+
+
+class CircuitBreaker:
+    """Stop calling a failing provider and probe it again after ``reset_timeout``.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    :meth:`allow` refuses calls. Once ``reset_timeout`` has passed one probe
+    call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self._threshold = max(failure_threshold, 1)
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self._reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self._threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+@dataclass(slots=True)
+class ProviderStats:
+    """Running counters describing how a provider has been behaving."""
+
+    requests: int = 0
+    failures: int = 0
+    throttled: int = 0
+    rejected: int = 0
+    average_latency: float = 0.0
+
+    def record_latency(self, seconds: float) -> None:
+        # Exponentially weighted so the figure follows recent behaviour.
+        self.average_latency = seconds if not self.requests else 0.8 * self.average_latency + 0.2 * seconds
+        self.requests += 1
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for retry number ``attempt`` (0-based)."""
+    return random.uniform(0.0, min(cap, base * (2**attempt)))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the delay a ``Retry-After`` header asks for, in seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0.0)
+
+
+__all__ = [
+    "CircuitBreaker",
+    "ProviderStats",
+    "ProviderUnavailable",
+    "TokenBucket",
+    "backoff_delay",
+    "parse_retry_after",
+]
@@ -0,0 +1,60 @@
+"""Route actions on a message back to the account it was synced from."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+from .mail_client import MailClient, MailMessage
+
+
+@dataclass(slots=True, frozen=True)
+class MessageRoute:
+    """Where a message lives: the client that synced it, its folder and UID."""
+
+    client: MailClient
+    folder: str
+    uid: int
+
+
+class MessageRegistry:
+    """Map message ids to the :class:`MessageRoute` they arrived through.
+
+    The sync engine records a route for every message it hands to the UI,
+    so marking, flagging or opening one is a single dictionary lookup no
+    matter how many accounts are configured. Only the ``limit`` most
+    recently registered routes are kept, which covers the live inboxes, new
+    mail and recent history; anything older is routed by account key by
+    the caller.
+    """
+
+    DEFAULT_LIMIT = 20000
+
+    def __init__(self, limit: int = DEFAULT_LIMIT) -> None:
+        self._limit = limit
+        self._lock = threading.Lock()
+        self._routes: OrderedDict[str, MessageRoute] = OrderedDict()
+
+    def register(self, client: MailClient, messages: Iterable[MailMessage]) -> None:
+        with self._lock:
+            for message in messages:
+                self._routes[message.id] = MessageRoute(client, message.folder, message.uid)
+                self._routes.move_to_end(message.id)
+            while len(self._routes) > self._limit:
+                self._routes.popitem(last=False)
+
+    def route(self, message_id: str) -> MessageRoute | None:
+        with self._lock:
+            return self._routes.get(message_id)
+
+    def forget(self, message_ids: Sequence[str]) -> None:
+        with self._lock:
+            for message_id in message_ids:
+                self._routes.pop(message_id, None)
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+
+__all__ = ["MessageRegistry", "MessageRoute"]
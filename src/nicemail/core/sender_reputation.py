@@ -0,0 +1,132 @@
+"""Per-account sender reputation built from how the user treats their mail."""
+from __future__ import annotations
+
+import email.utils
+from dataclasses import dataclass, replace
+from typing import Iterable, Sequence
+
+from .database import Database
+from .mail_client import MailMessage
+from .spam_assessment import SpamAssessment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    message_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    address TEXT NOT NULL,
+    opened INTEGER NOT NULL DEFAULT 0,
+    flagged INTEGER NOT NULL DEFAULT 0,
+    answered INTEGER NOT NULL DEFAULT 0,
+    verdict INTEGER
+);
+CREATE INDEX IF NOT EXISTS observations_by_sender ON observations (account_id, address);
+"""
+
+
+@dataclass(slots=True)
+class SenderRecord:
+    """How many of a sender's messages were opened, flagged, answered or judged spam/ham."""
+
+    opened: int = 0
+    flagged: int = 0
+    answered: int = 0
+    spam: int = 0
+    ham: int = 0
+
+
+class SenderReputation:
+    """Remember per account which senders are trusted and which send spam.
+
+    Every message contributes one observation, so re-syncing the same mail
+    never inflates the counts. A sender is trusted once the user answered or
+    flagged any of their messages, or opened ``min_messages`` of them with no
+    spam verdict; a sender is bad after ``min_messages`` spam verdicts and no
+    sign of interest.
+    """
+
+    def __init__(self, database: Database, min_messages: int = 3) -> None:
+        self._min_messages = max(min_messages, 1)
+        self._lock = database.lock
+        self._db = database.connection
+        self._senders: dict[tuple[str, str], SenderRecord] = {}
+        database.create_tables(SCHEMA)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT account_id, address, SUM(opened), SUM(flagged), SUM(answered), "
+                "SUM(verdict = 1), SUM(verdict = 0) FROM observations GROUP BY account_id, address"
+            ).fetchall()
+        for account_id, address, *counts in rows:
+            self._senders[(account_id, address)] = SenderRecord(*(int(count or 0) for count in counts))
+
+    def record(self, account_id: str, address: str) -> SenderRecord:
+        with self._lock:
+            record = self._senders.get((account_id, address.lower()))
+            return SenderRecord() if record is None else replace(record)
+
+    def assess(self, message: MailMessage) -> SpamAssessment | None:
+        """Return a verdict for a known-good or known-bad sender, else ``None``."""
+        with self._lock:
+            record = self._senders.get((message.account_id, sender_address(message)))
+        if record is None:
+            return None
+        if record.answered or record.flagged or (record.opened >= self._min_messages and not record.spam):
+            return SpamAssessment(message_id=message.id, is_spam=False, confidence=0.95)
+        if record.spam >= self._min_messages and not record.ham and not record.opened:
+            return SpamAssessment(message_id=message.id, is_spam=True, confidence=0.95)
+        return None
+
+    def observe(self, messages: Iterable[MailMessage]) -> None:
+        """Record the read, flag and answered state of ``messages``.
+
+        Signals only ever accumulate: a message once opened stays opened even
+        if it is later marked unread.
+        """
+        self._update(
+            (message, int(not message.is_unread), int(message.is_flagged), int(message.is_answered), None)
+            for message in messages
+        )
+
+    def record_verdicts(self, messages: Sequence[MailMessage], assessments: Iterable[SpamAssessment]) -> None:
+        by_id = {message.id: message for message in messages}
+        self._update(
+            (by_id[item.message_id], 0, 0, 0, int(item.is_spam)) for item in assessments if item.message_id in by_id
+        )
+
+    # ------------------------------ helpers --------------------------------
+    def _update(self, updates: Iterable[tuple[MailMessage, int, int, int, int | None]]) -> None:
+        updates = [update for update in updates if sender_address(update[0])]
+        if not updates:
+            return
+        with self._lock, self._db:
+            for message, opened, flagged, answered, verdict in updates:
+                address = sender_address(message)
+                row = self._db.execute(
+                    "SELECT opened, flagged, answered, verdict FROM observations WHERE message_id = ?", (message.id,)
+                ).fetchone()
+                old = row if row is not None else (0, 0, 0, None)
+                new = (
+                    max(old[0], opened),
+                    max(old[1], flagged),
+                    max(old[2], answered),
+                    old[3] if verdict is None else verdict,
+                )
+                if row is not None and new == tuple(row):
+                    continue
+                self._db.execute(
+                    "INSERT OR REPLACE INTO observations (message_id, account_id, address, opened, flagged, answered, "
+                    "verdict) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (message.id, message.account_id, address, *new),
+                )
+                record = self._senders.setdefault((message.account_id, address), SenderRecord())
+                record.opened += new[0] - old[0]
+                record.flagged += new[1] - old[1]
+                record.answered += new[2] - old[2]
+                record.spam += (new[3] == 1) - (old[3] == 1)
+                record.ham += (new[3] == 0) - (old[3] == 0)
+
+
+def sender_address(message: MailMessage) -> str:
+    return email.utils.parseaddr(message.sender)[1].lower()
+
+
+__all__ = ["SenderRecord", "SenderReputation", "sender_address"]
@@ -1,40 +1,182 @@
 """Shared services used across the application."""
 from __future__ import annotations
 
-from concurrent.futures import Future, ThreadPoolExecutor
-from typing import Any, Callable
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Coroutine, Sequence
 
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import QObject, Qt, Signal, Slot
 from PySide6.QtWidgets import QApplication
 
 Callback = Callable[[Any], None]
 
 
+class _MainThreadDispatcher(QObject):
+    """Run callbacks on the thread that created this object (the GUI thread)."""
+
+    invoke = Signal(object, object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.invoke.connect(self._call, Qt.ConnectionType.QueuedConnection)
+
+    @Slot(object, object)
+    def _call(self, callback: Callback, result: Any) -> None:
+        callback(result)
+
+
 class BackgroundTaskRunner:
     """Simple wrapper over a thread pool for background work."""
 
+    # Seconds :meth:`shutdown` waits for running work before giving up on it.
+    SHUTDOWN_GRACE = 5.0
+
     def __init__(self, max_workers: int = 4) -> None:
         self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nicemail")
+        self._dispatcher = _MainThreadDispatcher() if QApplication.instance() is not None else None
+        self._shutdown_hooks: list[Callable[[], None]] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._loop_lock = threading.Lock()
+        # Work started through run()/run_async() that has not finished yet.
+        self._running: set[Future] = set()
+        self._running_lock = threading.Lock()
 
     def run(self, func: Callable[[], Any], callback: Callback | None = None) -> Future:
-        future = self._executor.submit(func)
+        future = self._track(self._executor.submit(func))
         if callback:
-            def _done(fut: Future) -> None:
-                try:
-                    result = fut.result()
-                except Exception as exc:  # pragma: no cover - logged elsewhere
-                    result = exc
-                app = QApplication.instance()
-                if app is None:
-                    callback(result)
-                else:
-                    QTimer.singleShot(0, lambda: callback(result))
-
-            future.add_done_callback(_done)
+            self._deliver(future, callback)
         return future
 
+    def run_async(self, coroutine: Coroutine[Any, Any, Any], callback: Callback | None = None) -> Future:
+        """Run ``coroutine`` on the shared asyncio loop thread.
+
+        I/O-bound work for many accounts multiplexes on that one thread
+        instead of holding a pool worker each. ``callback`` gets the result
+        on the GUI thread, like :meth:`run`.
+        """
+        future = self._track(asyncio.run_coroutine_threadsafe(coroutine, self._event_loop()))
+        if callback:
+            self._deliver(future, callback)
+        return future
+
+    def run_periodically(self, interval: float, func: Callable[[], Any]) -> None:
+        """Run ``func`` in the pool every ``interval`` seconds until :meth:`shutdown`.
+
+        The timer lives on the shared asyncio loop, so no thread sleeps between runs.
+        """
+        loop = self._event_loop()
+
+        def tick() -> None:
+            if self._loop is not loop:
+                return
+            try:
+                self.run(func)
+            except RuntimeError:  # the pool has shut down
+                return
+            loop.call_later(interval, tick)
+
+        loop.call_soon_threadsafe(loop.call_later, interval, tick)
+
+    def wait_all(
+        self,
+        futures: Sequence[Future],
+        timeout: float | None = None,
+        on_result: Callable[[int, Any], None] | None = None,
+    ) -> list[Any]:
+        """Wait for ``futures`` (e.g. from :meth:`run` or :meth:`run_async`), at most ``timeout`` seconds.
+
+        Returns one entry per future, in order: its result, the exception it
+        raised, or :class:`TimeoutError` if it had not finished in time (the
+        work keeps running, its result is simply not waited for).
+        ``on_result(index, result)`` is called on the waiting thread as each
+        future completes, so callers can stream partial results.
+        """
+        index_of = {future: index for index, future in enumerate(futures)}
+        results: list[Any] = [TimeoutError() for _ in futures]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = set(futures)
+        while pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = index_of[future]
+                try:
+                    results[index] = future.result()
+                except Exception as exc:
+                    results[index] = exc
+                if on_result is not None:
+                    on_result(index, results[index])
+        return results
+
+    def post(self, callback: Callback, result: Any) -> None:
+        """Deliver ``result`` to ``callback`` on the GUI thread (safe from any thread)."""
+        if self._dispatcher is None:
+            callback(result)
+        else:
+            self._dispatcher.invoke.emit(callback, result)
+
+    def add_shutdown_hook(self, hook: Callable[[], None]) -> None:
+        """Call ``hook`` from :meth:`shutdown`, e.g. to close long-lived connections."""
+        self._shutdown_hooks.append(hook)
+
     def shutdown(self) -> None:
+        """Cancel queued work, wait up to ``SHUTDOWN_GRACE`` seconds for running work, then run the hooks.
+
+        Callers close the resources that work uses (databases, connections)
+        only after this returns.
+        """
         self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._running_lock:
+            running = list(self._running)
+        if running:
+            wait(running, timeout=self.SHUTDOWN_GRACE)
+        hooks, self._shutdown_hooks = self._shutdown_hooks, []
+        for hook in reversed(hooks):
+            hook()
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._loop_thread is not None:
+                self._loop_thread.join(timeout=2.0)
+
+    # ------------------------------ helpers --------------------------------
+    def _track(self, future: Future) -> Future:
+        with self._running_lock:
+            self._running.add(future)
+
+        def _forget(fut: Future) -> None:
+            with self._running_lock:
+                self._running.discard(fut)
+
+        future.add_done_callback(_forget)
+        return future
+
+    def _deliver(self, future: Future, callback: Callback) -> None:
+        def _done(fut: Future) -> None:
+            try:
+                result = fut.result()
+            except Exception as exc:  # pragma: no cover - logged elsewhere
+                result = exc
+            self.post(callback, result)
+
+        future.add_done_callback(_done)
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=loop.run_forever, name="nicemail-asyncio", daemon=True
+                )
+                self._loop_thread.start()
+                self._loop = loop
+            return self._loop
 
 
 __all__ = ["BackgroundTaskRunner"]
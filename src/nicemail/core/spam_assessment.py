@@ -0,0 +1,14 @@
+"""Result type shared by the spam filtering components."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class SpamAssessment:
+    message_id: str
+    is_spam: bool
+    confidence: float
+
+
+__all__ = ["SpamAssessment"]
@@ -0,0 +1,108 @@
+"""Persistent cache of spam verdicts so messages are classified only once."""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Iterable, Sequence
+
+from .database import Database
+from .mail_client import MailMessage
+from .spam_assessment import SpamAssessment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    message_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    is_spam INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_by_last_used ON verdicts (last_used);
+"""
+
+
+class SpamVerdictCache:
+    """Remember verdicts per message id and content fingerprint.
+
+    A verdict is reused only while the subject, sender and preview hash the
+    same and it is younger than ``ttl`` seconds. The least recently used
+    entries are evicted once more than ``max_entries`` are stored.
+
+    This table is the only record of verdicts: the message store hides
+    messages judged spam here. Spam verdicts are therefore kept until the
+    store deletes their message; only ham verdicts expire or get evicted.
+    """
+
+    def __init__(self, database: Database, ttl: float = 30 * 86400, max_entries: int = 20000) -> None:
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = database.lock
+        self._db = database.connection
+        database.create_tables(SCHEMA)
+
+    @staticmethod
+    def fingerprint(message: MailMessage) -> str:
+        content = "\0".join((message.subject, message.sender, message.preview))
+        return hashlib.blake2b(content.encode("utf8", "replace"), digest_size=16).hexdigest()
+
+    def lookup(self, messages: Sequence[MailMessage]) -> dict[str, SpamAssessment]:
+        """Return still-valid cached verdicts for ``messages``, keyed by message id."""
+        if not messages:
+            return {}
+        now = time.time()
+        by_id = {message.id: message for message in messages}
+        found: dict[str, SpamAssessment] = {}
+        with self._lock:
+            rows = []
+            ids = list(by_id)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                rows.extend(
+                    self._db.execute(
+                        "SELECT message_id, fingerprint, is_spam, confidence, created_at FROM verdicts "
+                        f"WHERE message_id IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                )
+            for message_id, fingerprint, is_spam, confidence, created_at in rows:
+                if now - created_at > self._ttl or fingerprint != self.fingerprint(by_id[message_id]):
+                    continue
+                found[message_id] = SpamAssessment(message_id=message_id, is_spam=bool(is_spam), confidence=confidence)
+            if found:
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE verdicts SET last_used = ? WHERE message_id = ?", [(now, key) for key in found]
+                    )
+        return found
+
+    def store(self, messages: Iterable[MailMessage], assessments: Iterable[SpamAssessment]) -> None:
+        by_id = {message.id: message for message in messages}
+        now = time.time()
+        rows = [
+            (
+                assessment.message_id,
+                self.fingerprint(by_id[assessment.message_id]),
+                int(assessment.is_spam),
+                assessment.confidence,
+                now,
+                now,
+            )
+            for assessment in assessments
+            if assessment.message_id in by_id
+        ]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("DELETE FROM verdicts WHERE is_spam = 0 AND created_at < ?", (now - self._ttl,))
+            (count,) = self._db.execute("SELECT COUNT(*) FROM verdicts WHERE is_spam = 0").fetchone()
+            if count > self._max_entries:
+                self._db.execute(
+                    "DELETE FROM verdicts WHERE message_id IN "
+                    "(SELECT message_id FROM verdicts WHERE is_spam = 0 ORDER BY last_used LIMIT ?)",
+                    (count - self._max_entries,),
+                )
+
+
+__all__ = ["SpamVerdictCache"]
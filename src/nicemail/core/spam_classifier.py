@@ -0,0 +1,131 @@
+"""Local naive Bayes tier that settles obvious spam/ham without a remote call."""
+from __future__ import annotations
+
+import math
+import re
+import zlib
+from typing import Iterable, Sequence
+
+from .database import Database
+from .mail_client import MailMessage
+
+FEATURE_BITS = 20
+MAX_TOKENS = 64
+
+_TOKEN_RE = re.compile(r"[\w$€£%!]{2,24}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    bucket INTEGER PRIMARY KEY,
+    spam INTEGER NOT NULL,
+    ham INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    label TEXT PRIMARY KEY,
+    documents INTEGER NOT NULL
+);
+"""
+
+
+class LocalSpamClassifier:
+    """Incrementally trained multinomial naive Bayes over hashed tokens.
+
+    Features are the subject and preview words plus the sender address and
+    domain, hashed into ``2**FEATURE_BITS`` buckets so the model stays small
+    no matter how much mail it sees. :meth:`spam_probability` returns
+    ``None`` until ``min_examples`` labelled messages (of both kinds) have
+    been learned.
+    """
+
+    def __init__(self, database: Database, min_examples: int = 50) -> None:
+        self._min_examples = min_examples
+        self._lock = database.lock
+        self._db = database.connection
+        database.create_tables(SCHEMA)
+        with self._lock:
+            self._counts: dict[int, list[int]] = {
+                bucket: [spam, ham] for bucket, spam, ham in self._db.execute("SELECT bucket, spam, ham FROM features")
+            }
+            totals = dict(self._db.execute("SELECT label, documents FROM totals").fetchall())
+        self._documents = [totals.get("spam", 0), totals.get("ham", 0)]
+        self._tokens = [0, 0]
+        for spam, ham in self._counts.values():
+            self._tokens[0] += spam
+            self._tokens[1] += ham
+
+    @property
+    def is_trained(self) -> bool:
+        spam, ham = self._documents
+        return spam + ham >= self._min_examples and spam > 0 and ham > 0
+
+    def spam_probability(self, message: MailMessage) -> float | None:
+        with self._lock:
+            if not self.is_trained:
+                return None
+            vocabulary = max(len(self._counts), 1)
+            spam_docs, ham_docs = self._documents
+            score = math.log(spam_docs) - math.log(ham_docs)
+            spam_norm = math.log(self._tokens[0] + vocabulary)
+            ham_norm = math.log(self._tokens[1] + vocabulary)
+            for bucket in self._features(message):
+                spam, ham = self._counts.get(bucket, (0, 0))
+                score += math.log(spam + 1) - spam_norm - math.log(ham + 1) + ham_norm
+        return 1.0 / (1.0 + math.exp(-max(min(score, 50.0), -50.0)))
+
+    def learn(self, examples: Iterable[tuple[MailMessage, bool]]) -> None:
+        """Add labelled messages to the model and persist the touched counts."""
+        touched: set[int] = set()
+        with self._lock:
+            for message, is_spam in examples:
+                column = 0 if is_spam else 1
+                self._documents[column] += 1
+                for bucket in self._features(message):
+                    self._counts.setdefault(bucket, [0, 0])[column] += 1
+                    self._tokens[column] += 1
+                    touched.add(bucket)
+            if not touched:
+                return
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO features (bucket, spam, ham) VALUES (?, ?, ?)",
+                    [(bucket, *self._counts[bucket]) for bucket in touched],
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO totals (label, documents) VALUES (?, ?)",
+                    [("spam", self._documents[0]), ("ham", self._documents[1])],
+                )
+
+    # ------------------------------ helpers --------------------------------
+    @staticmethod
+    def _features(message: MailMessage) -> set[int]:
+        mask = (1 << FEATURE_BITS) - 1
+        names: list[str] = []
+        sender = message.sender.lower()
+        address = sender[sender.find("<") + 1 : sender.rfind(">")] if "<" in sender else sender.strip()
+        names.append(f"from:{address}")
+        names.append(f"domain:{address.rpartition('@')[2]}")
+        names.extend(f"s:{token}" for token in _TOKEN_RE.findall(message.subject.lower())[:MAX_TOKENS])
+        names.extend(f"p:{token}" for token in _TOKEN_RE.findall(message.preview.lower())[:MAX_TOKENS])
+        return {zlib.crc32(name.encode("utf8")) & mask for name in names}
+
+
+def split_by_confidence(
+    classifier: LocalSpamClassifier, messages: Sequence[MailMessage], threshold: float, margin: float
+) -> tuple[list[tuple[MailMessage, float]], list[MailMessage]]:
+    """Split ``messages`` into locally decided ones and those needing escalation.
+
+    A message is decided locally when its spam probability is at least
+    ``margin`` away from ``threshold``.
+    """
+    decided: list[tuple[MailMessage, float]] = []
+    uncertain: list[MailMessage] = []
+    for message in messages:
+        probability = classifier.spam_probability(message)
+        if probability is not None and abs(probability - threshold) >= margin:
+            decided.append((message, probability))
+        else:
+            uncertain.append(message)
+    return decided, uncertain
+
+
+__all__ = ["LocalSpamClassifier", "split_by_confidence"]
@@ -1,107 +1,261 @@
-"""Integrate ChatGPT spam filtering."""
+"""Coordinate spam filtering across the cache, the local model and a provider."""
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+import importlib.util
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from typing import Sequence
 
 import httpx
 
 from .config import SpamConfig
+from .database import Database
 from .mail_client import MailMessage
+from .resilience import (
+    CircuitBreaker,
+    ProviderStats,
+    ProviderUnavailable,
+    TokenBucket,
+    backoff_delay,
+    parse_retry_after,
+)
+from .sender_reputation import SenderReputation
+from .spam_assessment import SpamAssessment
+from .spam_cache import SpamVerdictCache
+from .spam_classifier import LocalSpamClassifier, split_by_confidence
+from .spam_providers import SPAM_INSTRUCTIONS, SpamProvider, create_provider, message_prompt
 
-
-@dataclass(slots=True)
-class SpamAssessment:
-    message_id: str
-    is_spam: bool
-    confidence: float
+# Per-message framing (role, metadata, the JSON answer) on top of the prompt text.
+MESSAGE_OVERHEAD_TOKENS = 24
 
 
 class SpamManager:
     """Coordinate spam filtering leveraging ChatGPT (or other providers)."""
 
-    def __init__(self, config: SpamConfig) -> None:
+    def __init__(
+        self, config: SpamConfig, database: Database | None = None, provider: SpamProvider | None = None
+    ) -> None:
         self._config = config
+        self._provider = provider if provider is not None else create_provider(config)
+        # Usually the message store's database; without one the spam tables live in memory.
+        self._owned_database = Database() if database is None else None
+        database = database or self._owned_database
+        self._verdicts = SpamVerdictCache(database, config.cache_ttl_days * 86400, config.cache_max_entries)
+        self._local = LocalSpamClassifier(database, config.local_min_examples)
+        self._reputation = SenderReputation(database, config.reputation_min_messages)
+        self._http: httpx.Client | None = None
+        self._http_lock = threading.Lock()
+        self._bucket = TokenBucket(config.requests_per_minute / 60.0, max(config.max_concurrent_requests, 1))
+        self._breaker = CircuitBreaker(config.breaker_failures, config.breaker_reset)
+        self._stats = ProviderStats()
+        self._stats_lock = threading.Lock()
 
     def filter_messages(self, messages: Sequence[MailMessage]) -> Sequence[MailMessage]:
-        if not self._config.enabled or not self._config.api_key:
-            return messages
+        allowed, undecided, _verdicts = self.triage(messages)
+        if not undecided:
+            return allowed
+        spam = {assessment.message_id for assessment in self.classify_remote(undecided) if assessment.is_spam}
+        keep = {message.id for message in allowed}
+        keep.update(message.id for message in undecided if message.id not in spam)
+        return [message for message in messages if message.id in keep]
+
+    def triage(
+        self, messages: Sequence[MailMessage]
+    ) -> tuple[list[MailMessage], list[MailMessage], dict[str, SpamAssessment]]:
+        """Split ``messages`` into ``(allowed, undecided, verdicts)`` without any network I/O.
+
+        Cached verdicts, sender reputation and the local classifier settle
+        what they can; spam they recognise is in neither list. ``verdicts``
+        holds the assessment of every settled message by id. ``undecided``
+        messages need :meth:`classify_remote` for a verdict.
+        """
+        if not self._config.enabled or (self._provider.needs_api_key and not self._config.api_key):
+            return list(messages), [], {}
+        verdicts = self._verdicts.lookup(messages)
+        settled = [
+            known
+            for message in messages
+            if message.id not in verdicts and (known := self._reputation.assess(message)) is not None
+        ]
+        verdicts.update((assessment.message_id, assessment) for assessment in settled)
+        unseen = [message for message in messages if message.id not in verdicts]
+        decided, undecided = split_by_confidence(self._local, unseen, self._config.threshold, self._config.local_margin)
+        settled.extend(
+            SpamAssessment(
+                message_id=message.id,
+                is_spam=probability >= self._config.threshold,
+                confidence=max(probability, 1.0 - probability),
+            )
+            for message, probability in decided
+        )
+        # The verdict cache is where the message store looks up spam, so every new verdict goes there.
+        self._verdicts.store(messages, settled)
+        verdicts.update((assessment.message_id, assessment) for assessment in settled)
+        allowed = [message for message in messages if message.id in verdicts and not verdicts[message.id].is_spam]
+        return allowed, undecided, verdicts
+
+    def classify_remote(self, messages: Sequence[MailMessage]) -> Sequence[SpamAssessment]:
+        """Ask the remote model about ``messages``, remembering and learning from its verdicts.
+
+        Returns no assessments when the provider cannot be reached.
+        """
         try:
-            assessments = self._assess_messages(messages)
+            remote = self._assess_messages(messages)
         except Exception:
-            return messages
-        allowed = []
-        blocklist = {assessment.message_id for assessment in assessments if assessment.is_spam}
-        for message in messages:
-            if message.id in blocklist:
-                continue
-            allowed.append(message)
-        return allowed
+            return []
+        by_id = {message.id: message for message in messages}
+        self._local.learn((by_id[item.message_id], item.is_spam) for item in remote if item.message_id in by_id)
+        self._verdicts.store(messages, remote)
+        self._reputation.record_verdicts(messages, remote)
+        return remote
+
+    def observe(self, messages: Sequence[MailMessage]) -> None:
+        """Learn from the read, flag and answered state of ``messages`` (sender reputation)."""
+        self._reputation.observe(messages)
+
+    @property
+    def stats(self) -> ProviderStats:
+        with self._stats_lock:
+            return replace(self._stats)
+
+    def close_http(self) -> None:
+        """Close the pooled HTTP connections; a later request opens new ones."""
+        with self._http_lock:
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+
+    def close(self) -> None:
+        """Close HTTP connections; the shared database is closed by its owner (the message store)."""
+        self.close_http()
+        if self._owned_database is not None:
+            self._owned_database.close()
 
     # ------------------------ private helpers ------------------------------
+    def _client(self) -> httpx.Client:
+        """Return the shared HTTP client, so TLS sessions and connections are reused."""
+        with self._http_lock:
+            if self._http is None:
+                config = self._config
+                self._http = httpx.Client(
+                    http2=config.http2 and importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(
+                        max_connections=config.max_connections,
+                        max_keepalive_connections=config.max_keepalive_connections,
+                        keepalive_expiry=config.keepalive_expiry,
+                    ),
+                    timeout=httpx.Timeout(config.request_timeout, connect=config.connect_timeout),
+                )
+            return self._http
+
     def _assess_messages(self, messages: Sequence[MailMessage]) -> Sequence[SpamAssessment]:
-        if not messages:
-            return []
-        payload = self._build_payload(messages)
-        headers = {
-            "Authorization": f"Bearer {self._config.api_key}",
-            "Content-Type": "application/json",
-        }
-        response = httpx.post(
-            "https://api.openai.com/v1/responses",
-            headers=headers,
-            content=json.dumps(payload),
-            timeout=15,
-        )
-        response.raise_for_status()
-        data = response.json()
+        """Classify ``messages`` in token-budgeted chunks sent concurrently.
+
+        Chunks that fail are skipped; the error is raised only when every
+        chunk failed, so a partial outage still yields the verdicts we got.
+        """
+        chunks = self._chunk_messages(messages)
+        if len(chunks) <= 1:
+            return self._provider.classify(chunks[0], self._post) if chunks else []
         assessments: list[SpamAssessment] = []
-        for entry in data.get("choices", []):
-            message_id = entry.get("metadata", {}).get("message_id")
-            if not message_id:
-                continue
-            result = entry.get("content", [{}])[0].get("text", "")
-            try:
-                parsed = json.loads(result)
-            except json.JSONDecodeError:
-                continue
-            assessments.append(
-                SpamAssessment(
-                    message_id=message_id,
-                    is_spam=parsed.get("is_spam", False),
-                    confidence=float(parsed.get("confidence", 0.5)),
-                )
-            )
+        errors: list[Exception] = []
+        workers = max(1, min(self._config.max_concurrent_requests, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nicemail-spam") as executor:
+            for future in [executor.submit(self._provider.classify, chunk, self._post) for chunk in chunks]:
+                try:
+                    assessments.extend(future.result())
+                except Exception as exc:
+                    errors.append(exc)
+        if errors and len(errors) == len(chunks):
+            raise errors[0]
         return assessments
 
-    def _build_payload(self, messages: Sequence[MailMessage]) -> dict:
-        prompts = []
+    def _chunk_messages(self, messages: Sequence[MailMessage]) -> list[list[MailMessage]]:
+        """Group messages so each request stays within ``SpamConfig.batch_token_budget``."""
+        budget = max(self._config.batch_token_budget - _estimate_tokens(SPAM_INSTRUCTIONS), 1)
+        chunks: list[list[MailMessage]] = []
+        current: list[MailMessage] = []
+        used = 0
         for message in messages:
-            prompts.append(
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                                "You are a security assistant. "
-                                "Classify the following email as spam or legitimate. "
-                                "Return JSON with keys 'is_spam' and 'confidence'.\n\n"
-                                f"Subject: {message.subject}\n"
-                                f"From: {message.sender}\n"
-                                f"Preview: {message.preview}"
-                            ),
-                        }
-                    ],
-                    "metadata": {"message_id": message.id},
-                }
-            )
-        return {
-            "model": self._config.model,
-            "input": prompts,
-            "temperature": 0,
-        }
+            cost = _estimate_tokens(message_prompt(message)) + MESSAGE_OVERHEAD_TOKENS
+            if current and used + cost > budget:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(message)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _post(self, url: str, headers: dict[str, str], content: str) -> httpx.Response:
+        """POST with rate limiting, retries and the circuit breaker.
+
+        Waiting (for tokens, ``Retry-After`` or backoff) is bounded by
+        ``SpamConfig.request_timeout`` overall, so a degraded provider costs
+        a refresh at most that long and nothing at all once the circuit opens.
+        """
+        config = self._config
+        deadline = time.monotonic() + config.request_timeout
+        attempt = 0
+        while True:
+            if not self._breaker.allow():
+                self._count("rejected")
+                raise ProviderUnavailable("spam provider circuit is open")
+            if not self._bucket.acquire(max(deadline - time.monotonic(), 0.0)):
+                self._count("rejected")
+                raise ProviderUnavailable("spam provider rate limit reached")
+            started = time.monotonic()
+            delay: float | None = None
+            try:
+                response = self._client().post(url, headers=headers, content=content)
+            except httpx.TransportError:
+                self._breaker.record_failure()
+                self._count("failures")
+                if attempt >= config.max_retries:
+                    raise
+            else:
+                with self._stats_lock:
+                    self._stats.record_latency(time.monotonic() - started)
+                if response.status_code == 429:
+                    self._count("throttled")
+                    delay = parse_retry_after(response.headers.get("Retry-After"))
+                    if delay is None:
+                        delay = backoff_delay(attempt, config.backoff_base, config.backoff_max)
+                    # Shared bucket: concurrent chunks back off too, not just this one.
+                    self._bucket.pause(delay)
+                    # The server answered, so it is up; release a half-open probe without tripping the breaker.
+                    self._breaker.record_success()
+                elif response.status_code >= 500:
+                    self._breaker.record_failure()
+                    self._count("failures")
+                    delay = parse_retry_after(response.headers.get("Retry-After"))
+                else:
+                    # A 4xx is a bad request or configuration, not an outage: the service answered, so it is up.
+                    self._breaker.record_success()
+                    if response.is_error:
+                        self._count("failures")
+                    response.raise_for_status()
+                    return response
+                if attempt >= config.max_retries:
+                    response.raise_for_status()
+            if delay is None:
+                delay = backoff_delay(attempt, config.backoff_base, config.backoff_max)
+            if time.monotonic() + delay > deadline:
+                raise ProviderUnavailable("spam provider did not recover in time")
+            time.sleep(delay)
+            attempt += 1
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+
+
+# ------------------------------ helpers --------------------------------
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
 
 
 __all__ = ["SpamManager", "SpamAssessment"]
@@ -0,0 +1,226 @@
+"""Spam classification backends selectable through ``SpamConfig.provider``."""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from typing import Callable, Protocol, Sequence
+
+import httpx
+
+from .config import SpamConfig
+from .mail_client import MailMessage
+from .spam_assessment import SpamAssessment
+
+SPAM_INSTRUCTIONS = (
+    "You are a security assistant. "
+    "Classify each of the following emails as spam or legitimate. "
+    "For each one return JSON with keys 'is_spam' and 'confidence'."
+)
+BATCH_INSTRUCTIONS = (
+    SPAM_INSTRUCTIONS + " Answer with only a JSON array holding one object per email, "
+    "with keys 'id', 'is_spam' and 'confidence', using the id given for each email."
+)
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+LOCAL_BASE_URL = "http://localhost:11434/v1"
+
+_LOG = logging.getLogger(__name__)
+
+# POST ``content`` to ``url`` with ``headers``; SpamManager supplies one with retries and rate limiting.
+Transport = Callable[[str, dict[str, str], str], httpx.Response]
+
+
+class SpamProvider(Protocol):
+    #: Whether the provider is unusable without ``SpamConfig.api_key``.
+    needs_api_key: bool
+
+    def classify(self, messages: Sequence[MailMessage], transport: Transport) -> list[SpamAssessment]: ...
+
+
+def message_prompt(message: MailMessage) -> str:
+    return f"Subject: {message.subject}\nFrom: {message.sender}\nPreview: {message.preview}"
+
+
+class OpenAIResponsesProvider:
+    """OpenAI's Responses API, or any server exposing the same endpoint."""
+
+    needs_api_key = True
+
+    def __init__(self, config: SpamConfig) -> None:
+        self._config = config
+        self._url = f"{(config.base_url or OPENAI_BASE_URL).rstrip('/')}/responses"
+
+    def classify(self, messages: Sequence[MailMessage], transport: Transport) -> list[SpamAssessment]:
+        response = transport(self._url, _headers(self._config), json.dumps(self._build_payload(messages)))
+        data = response.json()
+        assessments: list[SpamAssessment] = []
+        for entry in data.get("choices", []):
+            message_id = entry.get("metadata", {}).get("message_id")
+            if not message_id:
+                continue
+            result = entry.get("content", [{}])[0].get("text", "")
+            try:
+                parsed = json.loads(result)
+            except json.JSONDecodeError:
+                continue
+            assessments.append(
+                SpamAssessment(
+                    message_id=message_id,
+                    is_spam=parsed.get("is_spam", False),
+                    confidence=float(parsed.get("confidence", 0.5)),
+                )
+            )
+        return assessments
+
+    def _build_payload(self, messages: Sequence[MailMessage]) -> dict:
+        prompts = [
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": message_prompt(message)}],
+                "metadata": {"message_id": message.id},
+            }
+            for message in messages
+        ]
+        return {
+            "model": self._config.model,
+            "instructions": SPAM_INSTRUCTIONS,
+            "input": prompts,
+            "temperature": 0,
+        }
+
+
+class ChatCompletionsProvider:
+    """Any OpenAI-compatible ``/chat/completions`` server, e.g. a local model runner.
+
+    All messages of a chunk go into one prompt and the model answers with a
+    JSON array, which suits the small models people run locally. The API
+    key is optional since local servers usually don't ask for one.
+    """
+
+    needs_api_key = False
+
+    def __init__(self, config: SpamConfig, default_base_url: str = LOCAL_BASE_URL) -> None:
+        self._config = config
+        self._url = f"{(config.base_url or default_base_url).rstrip('/')}/chat/completions"
+
+    def classify(self, messages: Sequence[MailMessage], transport: Transport) -> list[SpamAssessment]:
+        emails = "\n\n".join(f"Email id: {message.id}\n{message_prompt(message)}" for message in messages)
+        payload = {
+            "model": self._config.model,
+            "messages": [
+                {"role": "system", "content": BATCH_INSTRUCTIONS},
+                {"role": "user", "content": emails},
+            ],
+            "temperature": 0,
+        }
+        response = transport(self._url, _headers(self._config), json.dumps(payload))
+        choices = response.json().get("choices") or [{}]
+        return _parse_verdict_list(choices[0].get("message", {}).get("content", ""), {m.id for m in messages})
+
+
+class RulesProvider:
+    """Offline heuristics; no model and no network, so always available."""
+
+    needs_api_key = False
+
+    def classify(self, messages: Sequence[MailMessage], transport: Transport) -> list[SpamAssessment]:
+        assessments = []
+        for message in messages:
+            score = rule_score(message)
+            assessments.append(
+                SpamAssessment(message_id=message.id, is_spam=score >= 0.5, confidence=max(score, 1.0 - score))
+            )
+        return assessments
+
+
+_SPAM_RULES: tuple[tuple[re.Pattern[str], float], ...] = (
+    (re.compile(r"\b(viagra|cialis|casino|lottery|jackpot|crypto ?currency|bitcoin)\b", re.I), 0.45),
+    (re.compile(r"\b(you (have )?won|winner|claim your|free (money|gift|prize)|act now|limited time)\b", re.I), 0.35),
+    (
+        re.compile(r"\b(verify your account|account (is )?suspended|confirm your password|unusual sign-?in)\b", re.I),
+        0.35,
+    ),
+    (re.compile(r"\b(click here|unsubscribe|100% free|risk[- ]free|no cost)\b", re.I), 0.2),
+    (re.compile(r"[$€£]\s?\d[\d,.]*\s?(million|k)\b|\b\d+% off\b", re.I), 0.2),
+    (re.compile(r"!{3,}|\${2,}"), 0.15),
+)
+
+
+def rule_score(message: MailMessage) -> float:
+    """Heuristic spam likelihood in ``[0, 1]`` from the subject, sender and preview."""
+    text = message_prompt(message)
+    score = 0.05
+    for pattern, weight in _SPAM_RULES:
+        if pattern.search(text):
+            score += weight
+    letters = [char for char in message.subject if char.isalpha()]
+    if len(letters) >= 8 and sum(char.isupper() for char in letters) / len(letters) > 0.7:
+        score += 0.2
+    return min(score, 0.99)
+
+
+def create_provider(config: SpamConfig) -> SpamProvider:
+    """Build the backend named by ``config.provider``.
+
+    ``chatgpt``/``openai`` use the Responses API, ``openai-compatible`` and
+    ``local`` any ``/chat/completions`` server (``local`` defaulting to one
+    on localhost), and ``rules`` the built-in offline heuristics. An
+    unknown name is logged and falls back to ``rules``, so a typo in the
+    config never keeps the app from starting.
+    """
+    name = config.provider.strip().lower()
+    if name in ("chatgpt", "openai"):
+        return OpenAIResponsesProvider(config)
+    if name == "openai-compatible":
+        return ChatCompletionsProvider(config, OPENAI_BASE_URL)
+    if name == "local":
+        return ChatCompletionsProvider(config, LOCAL_BASE_URL)
+    if name == "rules":
+        return RulesProvider()
+    _LOG.warning("Unknown spam provider %r; using the built-in rules instead", config.provider)
+    return RulesProvider()
+
+
+# ------------------------------ helpers --------------------------------
+def _headers(config: SpamConfig) -> dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    if config.api_key:
+        headers["Authorization"] = f"Bearer {config.api_key}"
+    return headers
+
+
+def _parse_verdict_list(text: str, known_ids: set[str]) -> list[SpamAssessment]:
+    """Read the JSON array a chat model returned, tolerating prose or code fences around it."""
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return []
+    try:
+        entries = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return []
+    assessments = []
+    for entry in entries:
+        if not isinstance(entry, dict) or entry.get("id") not in known_ids:
+            continue
+        try:
+            confidence = float(entry.get("confidence", 0.5))
+        except (TypeError, ValueError):
+            confidence = 0.5
+        assessments.append(
+            SpamAssessment(message_id=entry["id"], is_spam=bool(entry.get("is_spam", False)), confidence=confidence)
+        )
+    return assessments
+
+
+__all__ = [
+    "ChatCompletionsProvider",
+    "OpenAIResponsesProvider",
+    "RulesProvider",
+    "SPAM_INSTRUCTIONS",
+    "SpamProvider",
+    "Transport",
+    "create_provider",
+    "message_prompt",
+    "rule_score",
+]
@@ -0,0 +1,440 @@
+"""Local SQLite cache of messages, folders and sync checkpoints."""
+from __future__ import annotations
+
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import Iterable, Sequence
+
+from .database import Database
+from .mail_client import MailFolder, MailMessage
+from .message_table import FLAG_FLAGGED, FLAG_UNREAD, MessageTable
+from .spam_cache import SCHEMA as VERDICTS_SCHEMA
+from .sync_state import FolderSyncState
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    preview TEXT NOT NULL,
+    date_received REAL NOT NULL,
+    is_unread INTEGER NOT NULL,
+    is_flagged INTEGER NOT NULL,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_by_folder_date ON messages (account_id, folder, date_received DESC);
+CREATE INDEX IF NOT EXISTS messages_by_date ON messages (folder, date_received DESC, id DESC);
+CREATE INDEX IF NOT EXISTS messages_by_uid ON messages (account_id, folder, uid);
+CREATE INDEX IF NOT EXISTS messages_by_received ON messages (date_received DESC);
+CREATE TABLE IF NOT EXISTS folders (
+    account_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    is_primary INTEGER NOT NULL,
+    sort_index INTEGER NOT NULL,
+    PRIMARY KEY (account_id, name)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    uidvalidity INTEGER NOT NULL,
+    uidnext INTEGER NOT NULL,
+    highestmodseq INTEGER NOT NULL,
+    PRIMARY KEY (account_id, folder)
+);
+"""
+
+# Full-text index over the cached messages. It is an external-content table, so
+# the text lives only in ``messages``; the triggers keep it in step with every
+# write the sync engine makes. (Row ids stay stable because we never VACUUM.)
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+    subject, sender, preview, body,
+    content='messages', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS message_search_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO message_search (rowid, subject, sender, preview, body)
+    VALUES (new.rowid, new.subject, new.sender, new.preview, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS message_search_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO message_search (message_search, rowid, subject, sender, preview, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.preview, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS message_search_update AFTER UPDATE OF subject, sender, preview, body ON messages
+WHEN old.subject IS NOT new.subject OR old.sender IS NOT new.sender
+    OR old.preview IS NOT new.preview OR old.body IS NOT new.body
+BEGIN
+    INSERT INTO message_search (message_search, rowid, subject, sender, preview, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.preview, old.body);
+    INSERT INTO message_search (rowid, subject, sender, preview, body)
+    VALUES (new.rowid, new.subject, new.sender, new.preview, new.body);
+END;
+"""
+
+# bm25 column weights: subject, sender, preview, body.
+SEARCH_RANK = "bm25(message_search, 10.0, 5.0, 2.0, 1.0)"
+# How many of the newest hits are ranked by relevance per query.
+SEARCH_CANDIDATES = 2000
+
+_SEARCH_TERM_RE = re.compile(r"\w+")
+# Spam verdicts live only in the verdict cache's table; listings and search leave those messages out.
+_NOT_SPAM = "NOT EXISTS (SELECT 1 FROM verdicts WHERE verdicts.message_id = messages.id AND verdicts.is_spam = 1)"
+
+# Sort key of a message within a folder: (received timestamp, id).
+MessageKey = tuple[float, str]
+
+_MESSAGE_COLUMNS = (
+    "id, account_id, folder, uid, subject, sender, preview, date_received, is_unread, is_flagged, body"
+)
+# What a MessageTable row holds: everything but preview and body.
+_TABLE_COLUMNS = "id, account_id, folder, uid, subject, sender, date_received, is_unread, is_flagged"
+# Stay below SQLite's limit on bound parameters per statement.
+_ID_BATCH = 500
+
+
+class MessageStore:
+    """Persist what we know about each mailbox so the UI can start from disk.
+
+    Writes are small and batched per sync, so sharing the :class:`Database`
+    connection (and its lock) with the spam tiers keeps contention low.
+    Without a ``database`` everything stays in memory. Which messages are
+    spam is read from the :class:`~nicemail.core.spam_cache.SpamVerdictCache`
+    table, which is created here too so the store works on its own.
+    """
+
+    def __init__(self, database: Database | None = None) -> None:
+        self.database = database if database is not None else Database()
+        self._lock = self.database.lock
+        self._db = self.database.connection
+        with self._lock:
+            self._db.executescript(SCHEMA + VERDICTS_SCHEMA)
+            self._searchable = self._create_search_index()
+
+    # ------------------------------ messages -------------------------------
+    def load_messages(
+        self,
+        account_id: str | Sequence[str] | None = None,
+        folder: str = "INBOX",
+        limit: int = 50,
+        include_spam: bool = False,
+        before: MessageKey | None = None,
+        since: MessageKey | None = None,
+    ) -> list[MailMessage]:
+        """Return cached messages newest first, for one account, several or all of them.
+
+        ``before`` and ``since`` page through the folder by :func:`message_key`:
+        only messages strictly older than ``before`` and no older than
+        ``since`` are returned.
+        """
+        where, params = _page_clauses(account_id, folder, include_spam, before, since)
+        params.append(limit)
+        query = f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE {where} ORDER BY date_received DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._row_to_message(row) for row in rows]
+
+    def load_table(
+        self,
+        account_id: str | Sequence[str] | None = None,
+        folder: str = "INBOX",
+        limit: int = 50,
+        before: MessageKey | None = None,
+        since: MessageKey | None = None,
+        table: MessageTable | None = None,
+    ) -> MessageTable:
+        """Like :meth:`load_messages`, but append the rows to ``table`` (a new one by default).
+
+        Previews and bodies are not read; the table loads previews through
+        :meth:`load_previews` when they are shown.
+        """
+        if table is None:
+            table = MessageTable(preview_loader=self.load_previews)
+        where, params = _page_clauses(account_id, folder, False, before, since)
+        params.append(limit)
+        query = (
+            f"SELECT {_TABLE_COLUMNS} FROM messages WHERE {where} ORDER BY date_received DESC, id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        for message_id, account, folder_name, uid, subject, sender, received, unread, flagged in rows:
+            table.append_row(
+                message_id,
+                account,
+                folder_name,
+                uid,
+                subject,
+                sender,
+                received,
+                (FLAG_UNREAD if unread else 0) | (FLAG_FLAGGED if flagged else 0),
+            )
+        return table
+
+    def load_previews(self, message_ids: Sequence[str]) -> dict[str, str]:
+        """Preview text of each of ``message_ids`` that is cached."""
+        previews: dict[str, str] = {}
+        with self._lock:
+            for start in range(0, len(message_ids), _ID_BATCH):
+                chunk = list(message_ids[start : start + _ID_BATCH])
+                previews.update(
+                    self._db.execute(
+                        f"SELECT id, preview FROM messages WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                )
+        return previews
+
+    def load_body(self, message_id: str) -> str | None:
+        """Full text of a message if it was downloaded before."""
+        with self._lock:
+            row = self._db.execute("SELECT body FROM messages WHERE id = ?", (message_id,)).fetchone()
+        return row[0] if row else None
+
+    def oldest_key(self, account_id: str, folder: str = "INBOX") -> MessageKey | None:
+        """:func:`message_key` of the oldest message cached for ``folder``, spam included."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT date_received, MIN(id) FROM messages WHERE account_id = ? AND folder = ? AND date_received = "
+                "(SELECT MIN(date_received) FROM messages WHERE account_id = ? AND folder = ?)",
+                (account_id, folder, account_id, folder),
+            ).fetchone()
+        return (row[0], row[1]) if row and row[1] is not None else None
+
+    def lowest_uid(self, account_id: str, folder: str = "INBOX") -> int:
+        """Smallest UID cached for ``folder``, or 0 when nothing is cached."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(uid) FROM messages WHERE account_id = ? AND folder = ?", (account_id, folder)
+            ).fetchone()
+        return row[0] or 0
+
+    def search_messages(self, query: str, limit: int = 50, offset: int = 0) -> list[MailMessage]:
+        """Return cached messages matching ``query``, best match first.
+
+        Every word must match subject, sender, preview or body; the last
+        word also matches as a prefix so results follow the user's typing.
+        Relevance is judged among the ``SEARCH_CANDIDATES`` most recently
+        received hits (more when paging deeper), which keeps common words
+        fast on huge mailboxes.
+        Spam is left out. Falls back to a plain substring scan when this
+        SQLite build lacks FTS5.
+        """
+        terms = _SEARCH_TERM_RE.findall(query)
+        if not terms or limit <= 0:
+            return []
+        offset = max(offset, 0)
+        if self._searchable:
+            match = " ".join(f'"{term}"' for term in terms) + "*"
+            # Take the newest hits by walking the date index, then score only those. The candidates' rowid
+            # bounds only narrow the FTS scan (less so once paging backfills old mail); the IN test decides.
+            sql = (
+                "WITH candidates AS MATERIALIZED ("
+                "SELECT rowid FROM messages INDEXED BY messages_by_received WHERE rowid IN "
+                "(SELECT rowid FROM message_search WHERE message_search MATCH ?1) "
+                "ORDER BY date_received DESC LIMIT ?2) "
+                f"SELECT {_qualified_columns('messages')} FROM ("
+                f"SELECT rowid, {SEARCH_RANK} AS score FROM message_search WHERE message_search MATCH ?1 "
+                "AND rowid BETWEEN (SELECT MIN(rowid) FROM candidates) AND (SELECT MAX(rowid) FROM candidates) "
+                "AND +rowid IN (SELECT rowid FROM candidates)"
+                ") AS hits JOIN messages ON messages.rowid = hits.rowid "
+                f"WHERE {_NOT_SPAM} "
+                "ORDER BY hits.score, messages.date_received DESC LIMIT ?3 OFFSET ?4"
+            )
+            params: list[object] = [match, max(SEARCH_CANDIDATES, offset + limit), limit, offset]
+        else:
+            clause = "(subject LIKE ? OR sender LIKE ? OR preview LIKE ? OR body LIKE ?)"
+            params = []
+            for term in terms:
+                params.extend([f"%{term}%"] * 4)
+            sql = (
+                f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE {_NOT_SPAM} AND "
+                f"{' AND '.join([clause] * len(terms))} ORDER BY date_received DESC LIMIT ? OFFSET ?"
+            )
+            params.extend([limit, offset])
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [self._row_to_message(row) for row in rows]
+
+    def upsert_messages(self, messages: Iterable[MailMessage]) -> None:
+        rows = [self._message_to_row(message) for message in messages]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT INTO messages ({_MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET subject = excluded.subject, sender = excluded.sender, "
+                "preview = excluded.preview, date_received = excluded.date_received, "
+                "is_unread = excluded.is_unread, is_flagged = excluded.is_flagged, "
+                "body = COALESCE(excluded.body, messages.body)",
+                rows,
+            )
+
+    def update_flags(self, messages: Iterable[MailMessage]) -> None:
+        rows = [(int(message.is_unread), int(message.is_flagged), message.id) for message in messages]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany("UPDATE messages SET is_unread = ?, is_flagged = ? WHERE id = ?", rows)
+
+    def save_body(self, message_id: str, body: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE messages SET body = ? WHERE id = ?", (body, message_id))
+
+    def delete_messages(self, message_ids: Sequence[str]) -> None:
+        if not message_ids:
+            return
+        rows = [(message_id,) for message_id in message_ids]
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM messages WHERE id = ?", rows)
+            self._db.executemany("DELETE FROM verdicts WHERE message_id = ?", rows)
+
+    def delete_folder(self, account_id: str, folder: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM verdicts WHERE message_id IN "
+                "(SELECT id FROM messages WHERE account_id = ? AND folder = ?)",
+                (account_id, folder),
+            )
+            self._db.execute("DELETE FROM messages WHERE account_id = ? AND folder = ?", (account_id, folder))
+
+    # ------------------------------- folders -------------------------------
+    def save_folders(self, account_id: str, folders: Sequence[MailFolder]) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM folders WHERE account_id = ?", (account_id,))
+            self._db.executemany(
+                "INSERT INTO folders (account_id, name, display_name, is_primary, sort_index) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (account_id, folder.name, folder.display_name, int(folder.is_primary), folder.sort_index)
+                    for folder in folders
+                ],
+            )
+
+    def load_folders(self, account_id: str | None = None) -> list[MailFolder]:
+        query = "SELECT name, display_name, is_primary, sort_index FROM folders"
+        params: tuple[object, ...] = ()
+        if account_id is not None:
+            query += " WHERE account_id = ?"
+            params = (account_id,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY sort_index", params).fetchall()
+        return [
+            MailFolder(name=name, display_name=display, is_primary=bool(primary), sort_index=index)
+            for name, display, primary, index in rows
+        ]
+
+    # ----------------------------- sync state ------------------------------
+    def load_sync_states(self) -> dict[str, dict[str, FolderSyncState]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT account_id, folder, uidvalidity, uidnext, highestmodseq FROM sync_state"
+            ).fetchall()
+        states: dict[str, dict[str, FolderSyncState]] = {}
+        for account_id, folder, uidvalidity, uidnext, highestmodseq in rows:
+            states.setdefault(account_id, {})[folder] = FolderSyncState(
+                folder=folder, uidvalidity=uidvalidity, uidnext=uidnext, highestmodseq=highestmodseq
+            )
+        return states
+
+    def save_sync_state(self, account_id: str, state: FolderSyncState) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (account_id, folder, uidvalidity, uidnext, highestmodseq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (account_id, state.folder, state.uidvalidity, state.uidnext, state.highestmodseq),
+            )
+
+    def delete_sync_state(self, account_id: str, folder: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sync_state WHERE account_id = ? AND folder = ?", (account_id, folder))
+
+    def close(self) -> None:
+        self.database.close()
+
+    # ------------------------------ helpers --------------------------------
+    def _create_search_index(self) -> bool:
+        """Create the FTS5 index, filling it from existing rows the first time."""
+        existed = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_search'"
+        ).fetchone()
+        try:
+            with self._db:
+                self._db.executescript(SEARCH_SCHEMA)
+                if not existed:
+                    self._db.execute("INSERT INTO message_search (message_search) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    @staticmethod
+    def _message_to_row(message: MailMessage) -> tuple:
+        return (
+            message.id,
+            message.account_id,
+            message.folder,
+            message.uid,
+            message.subject,
+            message.sender,
+            message.preview,
+            message.date_received.timestamp(),
+            int(message.is_unread),
+            int(message.is_flagged),
+            message.body,
+        )
+
+    @staticmethod
+    def _row_to_message(row: Sequence) -> MailMessage:
+        message_id, account_id, folder, uid, subject, sender, preview, received, unread, flagged, body = row
+        return MailMessage(
+            id=message_id,
+            account_id=account_id,
+            subject=subject,
+            sender=sender,
+            preview=preview,
+            date_received=datetime.fromtimestamp(received, tz=timezone.utc),
+            is_unread=bool(unread),
+            is_flagged=bool(flagged),
+            folder=folder,
+            body=body,
+            uid=uid,
+        )
+
+
+def message_key(message: MailMessage) -> MessageKey:
+    """Position of ``message`` in the store's newest-first order, for paging with ``before``/``since``."""
+    return (message.date_received.timestamp(), message.id)
+
+
+def _page_clauses(
+    account_id: str | Sequence[str] | None,
+    folder: str,
+    include_spam: bool,
+    before: MessageKey | None,
+    since: MessageKey | None,
+) -> tuple[str, list[object]]:
+    clauses = ["folder = ?"]
+    params: list[object] = [folder]
+    if isinstance(account_id, str):
+        clauses.append("account_id = ?")
+        params.append(account_id)
+    elif account_id is not None:
+        clauses.append(f"account_id IN ({', '.join('?' * len(account_id))})")
+        params.extend(account_id)
+    if not include_spam:
+        clauses.append(_NOT_SPAM)
+    if before is not None:
+        clauses.append("(date_received, id) < (?, ?)")
+        params.extend(before)
+    if since is not None:
+        clauses.append("(date_received, id) >= (?, ?)")
+        params.extend(since)
+    return " AND ".join(clauses), params
+
+
+def _qualified_columns(table: str) -> str:
+    return ", ".join(f"{table}.{column.strip()}" for column in _MESSAGE_COLUMNS.split(","))
+
+
+__all__ = ["MessageKey", "MessageStore", "message_key"]
@@ -0,0 +1,59 @@
+"""Per-folder IMAP synchronisation checkpoints."""
+from __future__ import annotations
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Protocol
+
+
+@dataclass(slots=True)
+class FolderSyncState:
+    """What we last saw of a folder: enough to ask the server only for changes."""
+
+    folder: str
+    uidvalidity: int = 0
+    uidnext: int = 0
+    highestmodseq: int = 0
+
+
+class SyncStateBackend(Protocol):
+    def load_sync_states(self) -> dict[str, dict[str, FolderSyncState]]: ...
+
+    def save_sync_state(self, account_id: str, state: FolderSyncState) -> None: ...
+
+    def delete_sync_state(self, account_id: str, folder: str) -> None: ...
+
+
+class SyncStateStore:
+    """Keep :class:`FolderSyncState` per account and folder.
+
+    States are cached in memory and written through to ``backend`` (usually
+    the :class:`~nicemail.core.store.MessageStore`) when one is given.
+    """
+
+    def __init__(self, backend: SyncStateBackend | None = None) -> None:
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._states: dict[str, dict[str, FolderSyncState]] = backend.load_sync_states() if backend else {}
+
+    def get(self, account_id: str, folder: str) -> FolderSyncState:
+        with self._lock:
+            state = self._states.get(account_id, {}).get(folder)
+            if state is None:
+                return FolderSyncState(folder=folder)
+            return FolderSyncState(**asdict(state))
+
+    def put(self, account_id: str, state: FolderSyncState) -> None:
+        with self._lock:
+            self._states.setdefault(account_id, {})[state.folder] = FolderSyncState(**asdict(state))
+        if self._backend is not None:
+            self._backend.save_sync_state(account_id, state)
+
+    def forget(self, account_id: str, folder: str) -> None:
+        with self._lock:
+            self._states.get(account_id, {}).pop(folder, None)
+        if self._backend is not None:
+            self._backend.delete_sync_state(account_id, folder)
+
+
+__all__ = ["FolderSyncState", "SyncStateBackend", "SyncStateStore"]
@@ -1,6 +1,7 @@
 """User interface components for NiceMail."""
 
 __all__ = [
+    "delegates",
     "main_window",
     "models",
 ]
@@ -0,0 +1,191 @@
+"""Item delegates that paint the message list."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PySide6.QtCore import QModelIndex, QPointF, QSize, Qt
+from PySide6.QtGui import QFont, QFontMetrics, QPainter, QPalette, QStaticText, QTransform
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionViewItem, QWidget
+
+from ..core.mail_client import MailMessage
+
+PADDING = 12
+LINE_SPACING = 4
+DATE_GAP = 16
+
+
+@dataclass(slots=True)
+class _Fonts:
+    """Fonts shared by every row; building a QFont per paint is what made scrolling slow."""
+
+    sender: QFont
+    sender_unread: QFont
+    subject: QFont
+    subject_unread: QFont
+    subject_pending: QFont
+    subject_pending_unread: QFont
+    preview: QFont
+    date: QFont
+    sender_height: int
+    subject_height: int
+    preview_height: int
+
+
+@dataclass(slots=True)
+class _RowText:
+    """Elided, pre-laid-out text of one row, valid while ``signature`` matches."""
+
+    signature: tuple
+    sender: QStaticText
+    subject: QStaticText
+    preview: QStaticText
+    date: QStaticText
+    date_width: int
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """Paint sender, subject, preview and date with cached :class:`QStaticText`.
+
+    Each row's text is elided and laid out once, then reused until the
+    message or the row width changes: the cached layout carries the values
+    it was built from and is rebuilt when they differ. Fonts are built once
+    per view font. Only ``Qt.UserRole`` is read from the model, so painting
+    never formats strings or builds fonts.
+    """
+
+    CACHE_SIZE = 1024
+
+    def __init__(self, parent: QWidget | None = None) -> None:
+        super().__init__(parent)
+        self._fonts: dict[str, _Fonts] = {}
+        self._last_font: tuple[QFont, _Fonts] | None = None
+        self._rows: OrderedDict[str, _RowText] = OrderedDict()
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        message = index.data(Qt.UserRole)
+        if not isinstance(message, MailMessage):
+            super().paint(painter, option, index)
+            return
+        # The delegate's parent is its view; ``option.widget`` is unreliable in some PySide6 releases.
+        widget = self.parent() if isinstance(self.parent(), QWidget) else None
+        style = widget.style() if widget is not None else QApplication.style()
+        # Background, hover and selection come from the style sheet (QListView::item).
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter, widget)
+
+        fonts = self._fonts_for(option.font)
+        rect = option.rect.adjusted(PADDING, PADDING, -PADDING, -PADDING)
+        row = self._row_text(message, fonts, rect.width())
+        painter.save()
+        painter.setClipRect(option.rect)
+        # The style sheet highlights selection with a light background, so text keeps its normal colour.
+        painter.setPen(option.palette.color(QPalette.ColorRole.Text))
+        sender_font = fonts.sender_unread if message.is_unread else fonts.sender
+        subject_font = self._subject_font(message, fonts)
+        y = rect.top()
+        painter.setFont(sender_font)
+        painter.drawStaticText(QPointF(rect.left(), y), row.sender)
+        painter.setFont(fonts.date)
+        painter.drawStaticText(QPointF(rect.right() - row.date_width, y), row.date)
+        y += fonts.sender_height + LINE_SPACING
+        painter.setFont(subject_font)
+        painter.drawStaticText(QPointF(rect.left(), y), row.subject)
+        y += fonts.subject_height + LINE_SPACING
+        painter.setPen(option.palette.color(QPalette.ColorRole.PlaceholderText))
+        painter.setFont(fonts.preview)
+        painter.drawStaticText(QPointF(rect.left(), y), row.preview)
+        painter.restore()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:  # noqa: N802
+        fonts = self._fonts_for(option.font)
+        height = fonts.sender_height + fonts.subject_height + fonts.preview_height + 2 * LINE_SPACING + 2 * PADDING
+        return QSize(max(option.rect.width(), 0), height)
+
+    # ------------------------------ helpers --------------------------------
+    def _fonts_for(self, base: QFont) -> _Fonts:
+        if self._last_font is not None and self._last_font[0] == base:
+            return self._last_font[1]
+        key = base.key()
+        fonts = self._fonts.get(key)
+        if fonts is None:
+            sender_unread = _derive(base, 12, bold=True)
+            subject_unread = _derive(base, 12, bold=True)
+            preview = _derive(base, 11)
+            fonts = self._fonts[key] = _Fonts(
+                sender=_derive(base, 12),
+                sender_unread=sender_unread,
+                subject=_derive(base, 12),
+                subject_unread=subject_unread,
+                subject_pending=_derive(base, 12, italic=True),
+                subject_pending_unread=_derive(base, 12, bold=True, italic=True),
+                preview=preview,
+                date=_derive(base, 11),
+                sender_height=QFontMetrics(sender_unread).height(),
+                subject_height=QFontMetrics(subject_unread).height(),
+                preview_height=QFontMetrics(preview).height(),
+            )
+        self._last_font = (QFont(base), fonts)
+        return fonts
+
+    @staticmethod
+    def _subject_font(message: MailMessage, fonts: _Fonts) -> QFont:
+        if message.spam_pending:
+            return fonts.subject_pending_unread if message.is_unread else fonts.subject_pending
+        return fonts.subject_unread if message.is_unread else fonts.subject
+
+    def _row_text(self, message: MailMessage, fonts: _Fonts, width: int) -> _RowText:
+        signature = (
+            message.sender,
+            message.subject,
+            message.preview,
+            message.date_received,
+            message.is_unread,
+            message.is_flagged,
+            message.spam_pending,
+            width,
+            id(fonts),
+        )
+        row = self._rows.get(message.id)
+        if row is not None and row.signature == signature:
+            self._rows.move_to_end(message.id)
+            return row
+
+        date_text = message.date_received.strftime("%b %d, %H:%M")
+        if message.is_flagged:
+            date_text = f"⭐ {date_text}"
+        date_width = QFontMetrics(fonts.date).horizontalAdvance(date_text)
+        sender_font = fonts.sender_unread if message.is_unread else fonts.sender
+        row = _RowText(
+            signature=signature,
+            sender=_static(message.sender, sender_font, width - date_width - DATE_GAP),
+            subject=_static(message.subject, self._subject_font(message, fonts), width),
+            preview=_static(" ".join(message.preview.split()), fonts.preview, width),
+            date=_static(date_text, fonts.date),
+            date_width=date_width,
+        )
+        self._rows[message.id] = row
+        self._rows.move_to_end(message.id)
+        while len(self._rows) > self.CACHE_SIZE:
+            self._rows.popitem(last=False)
+        return row
+
+
+def _derive(base: QFont, point_size: int, bold: bool = False, italic: bool = False) -> QFont:
+    font = QFont(base)
+    font.setPointSize(point_size)
+    font.setBold(bold)
+    font.setItalic(italic)
+    return font
+
+
+def _static(text: str, font: QFont, width: int | None = None) -> QStaticText:
+    if width is not None:
+        text = QFontMetrics(font).elidedText(text, Qt.TextElideMode.ElideRight, max(width, 0))
+    static = QStaticText(text)
+    static.setTextFormat(Qt.TextFormat.PlainText)
+    static.setPerformanceHint(QStaticText.PerformanceHint.AggressiveCaching)
+    static.prepare(QTransform(), font)
+    return static
+
+
+__all__ = ["MessageDelegate"]
@@ -1,11 +1,14 @@
 """Main window for the NiceMail application."""
 from __future__ import annotations
 
-from PySide6.QtCore import QItemSelection, Qt
+from typing import Sequence
+
+from PySide6.QtCore import QItemSelection, Qt, QTimer
 from PySide6.QtWidgets import (
     QAbstractItemView,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
     QListView,
     QMainWindow,
     QMessageBox,
@@ -15,7 +18,10 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from ..core.controller import InboxData, MailController
+from ..core.controller import SEARCH_PAGE_SIZE, InboxData, MailController, SpamUpdate
+from ..core.mail_client import MailMessage
+from ..core.store import message_key
+from .delegates import MessageDelegate
 from .models import MessageListModel
 from .widgets.detail_panel import MessageDetailPanel
 from .widgets.folder_hint import FolderHint
@@ -27,11 +33,19 @@ class MainWindow(QMainWindow):
         self._controller = controller
         self.setWindowTitle("NiceMail")
         self.setMinimumSize(1024, 640)
+        self._body_requests: set[str] = set()
+        # The inbox as last synced; the list shows search hits instead while a query is active.
+        self._inbox_messages: list[MailMessage] = []
+        self._search_query = ""
+        self._search_generation = 0
+        self._search_exhausted = True
 
         self._setup_widgets()
+        self._controller.set_classification_listener(self._on_spam_update)
         if use_sample_data:
             self._controller.ensure_sample_client()
-        self._load_inbox()
+        # Load once the event loop runs, so the window paints before any I/O.
+        QTimer.singleShot(0, self._load_inbox)
 
     # --------------------------- setup ------------------------------------
     def _setup_widgets(self) -> None:
@@ -43,9 +57,15 @@ class MainWindow(QMainWindow):
         self._message_list = self._build_message_list()
         self._detail_panel = MessageDetailPanel(self)
 
+        message_pane = QWidget(self)
+        pane_layout = QVBoxLayout(message_pane)
+        pane_layout.setContentsMargins(0, 8, 0, 0)
+        pane_layout.addWidget(self._build_search_box())
+        pane_layout.addWidget(self._message_list)
+
         splitter = QSplitter(Qt.Orientation.Horizontal)
         splitter.addWidget(sidebar)
-        splitter.addWidget(self._message_list)
+        splitter.addWidget(message_pane)
         splitter.addWidget(self._detail_panel)
         splitter.setSizes([200, 320, 400])
         layout.addWidget(splitter)
@@ -85,37 +105,64 @@ class MainWindow(QMainWindow):
         view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         view.setUniformItemSizes(True)
-        view.setWordWrap(True)
+        view.setItemDelegate(MessageDelegate(view))
         view.setSpacing(8)
         view.setResizeMode(QListView.ResizeMode.Adjust)
         view.verticalScrollBar().setSingleStep(40)
+        view.verticalScrollBar().valueChanged.connect(self._on_list_scrolled)
         self._model = MessageListModel()
+        self._model.set_page_source(
+            lambda before, limit, done: self._controller.load_older_async(before, done, limit),
+            self._controller.load_previews_async,
+        )
         view.setModel(self._model)
         view.selectionModel().selectionChanged.connect(self._on_list_selection_changed)
         return view
 
+    def _build_search_box(self) -> QLineEdit:
+        box = QLineEdit(self)
+        box.setObjectName("searchBox")
+        box.setPlaceholderText("Search all mail…")
+        box.setClearButtonEnabled(True)
+        # Search once typing pauses rather than on every keystroke.
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(200)
+        self._search_timer.timeout.connect(lambda: self._start_search(box.text()))
+        box.textChanged.connect(lambda _text: self._search_timer.start())
+        return box
+
     # --------------------------- data loading ------------------------------
     def _load_inbox(self) -> None:
-        inbox = self._controller.load_initial_inbox()
-        self._apply_inbox(inbox)
-        self._controller.refresh_inbox_async(self._on_inbox_refreshed)
+        cached = self._controller.load_cached_inbox()
+        if cached.messages:
+            self._apply_inbox(cached)
+        self._controller.refresh_inbox_async(self._on_inbox_refreshed, on_progress=self._on_inbox_progress)
 
     def _apply_inbox(self, inbox: InboxData) -> None:
-        self._model.set_messages(inbox.messages)
-        if inbox.unread_count:
-            message = f"You have {inbox.unread_count} new message{'s' if inbox.unread_count != 1 else ''}."
+        self._inbox_messages = list(inbox.messages)
+        self._folder_hint.set_folders(inbox.folders)
+        self._controller.start_push(self._on_new_messages)
+        if self._search_query:
+            return
+        self._model.update_messages(inbox.messages)
+        self._update_summary(inbox.unread_count)
+        if inbox.messages and not self._message_list.currentIndex().isValid():
+            self._select_first()
+
+    def _update_summary(self, unread_count: int) -> None:
+        if unread_count:
+            message = f"You have {unread_count} new message{'s' if unread_count != 1 else ''}."
         else:
             message = "You're all caught up. Enjoy your day!"
         self._summary_label.setText(message)
-        self._folder_hint.set_folders(inbox.folders)
-        if inbox.messages:
-            self._select_first()
 
     def _select_first(self) -> None:
         index = self._model.index(0, 0)
-        if index.isValid():
+        message = self._model.message_at(0) if index.isValid() else None
+        if message is not None:
             self._message_list.setCurrentIndex(index)
-            self._detail_panel.show_message(self._model.message_at(index.row()))
+            self._show_message(message)
 
     # ---------------------------- events -----------------------------------
     def _on_inbox_refreshed(self, result: InboxData | Exception) -> None:
@@ -124,6 +171,86 @@ class MainWindow(QMainWindow):
             return
         self._apply_inbox(result)
 
+    def _on_inbox_progress(self, partial: InboxData) -> None:
+        if partial.messages:
+            self._apply_inbox(partial)
+
+    def _on_new_messages(self, result: Sequence[MailMessage] | Exception) -> None:
+        if isinstance(result, Exception) or not result:
+            return
+        known = {message.id for message in self._inbox_messages}
+        self._inbox_messages.extend(message for message in result if message.id not in known)
+        if self._search_query:
+            return
+        self._model.add_messages(result)
+        self._update_summary(self._model.unread_count())
+
+    def _on_spam_update(self, update: SpamUpdate) -> None:
+        self._model.remove_messages(update.spam_ids)
+        self._model.clear_spam_pending(update.cleared_ids)
+        spam, cleared = set(update.spam_ids), set(update.cleared_ids)
+        self._inbox_messages = [message for message in self._inbox_messages if message.id not in spam]
+        for message in self._inbox_messages:
+            if message.id in cleared:
+                message.spam_pending = False
+        if not self._search_query:
+            self._update_summary(self._model.unread_count())
+
+    # ---------------------------- search -----------------------------------
+    def _start_search(self, text: str) -> None:
+        query = text.strip()
+        if query == self._search_query:
+            return
+        self._search_query = query
+        self._search_generation += 1
+        if not query:
+            self._search_exhausted = True
+            self._inbox_messages.sort(key=message_key, reverse=True)
+            self._model.update_messages(self._inbox_messages)
+            self._model.set_paging(True)
+            self._update_summary(sum(message.is_unread for message in self._inbox_messages))
+            return
+        self._model.set_paging(False)
+        self._summary_label.setText("Searching…")
+        self._request_search_page(0)
+
+    def _request_search_page(self, offset: int) -> None:
+        self._search_exhausted = True
+        generation = self._search_generation
+        self._controller.search_async(
+            self._search_query,
+            lambda result: self._on_search_results(generation, offset, result),
+            limit=SEARCH_PAGE_SIZE,
+            offset=offset,
+        )
+
+    def _on_search_results(self, generation: int, offset: int, result: Sequence[MailMessage] | Exception) -> None:
+        if generation != self._search_generation:
+            return
+        if isinstance(result, Exception):
+            self._summary_label.setText("Search is not available right now.")
+            return
+        self._search_exhausted = len(result) < SEARCH_PAGE_SIZE
+        if offset:
+            shown = [self._model.message_at(row) for row in range(self._model.rowCount())]
+            self._model.update_messages([*(message for message in shown if message is not None), *result])
+        else:
+            self._model.update_messages(result)
+            self._message_list.scrollToTop()
+        count = self._model.rowCount()
+        if count:
+            found = f"{count}{'' if self._search_exhausted else '+'} message{'s' if count != 1 else ''}"
+            self._summary_label.setText(f"Found {found} for “{self._search_query}”.")
+        else:
+            self._summary_label.setText(f"Nothing found for “{self._search_query}”.")
+
+    def _on_list_scrolled(self, value: int) -> None:
+        """Load the next page of search hits when the list reaches its end."""
+        if not self._search_query or self._search_exhausted:
+            return
+        if value >= self._message_list.verticalScrollBar().maximum():
+            self._request_search_page(self._model.rowCount())
+
     def _on_list_selection_changed(self, selected: QItemSelection, _deselected: QItemSelection) -> None:
         indexes = selected.indexes()
         if not indexes:
@@ -131,13 +258,27 @@ class MainWindow(QMainWindow):
         index = indexes[0]
         row = index.row()
         message = self._model.message_at(row)
+        if message is None:
+            return
         self._controller.mark_as_read(message)
         self._model.notify_message_changed(row)
+        self._show_message(message)
+
+    def _show_message(self, message: MailMessage) -> None:
         self._detail_panel.show_message(message)
+        if message.body is None and message.id not in self._body_requests:
+            self._body_requests.add(message.id)
+            self._controller.load_message_body_async(message, lambda _result: self._on_body_loaded(message))
+
+    def _on_body_loaded(self, message: MailMessage) -> None:
+        self._body_requests.discard(message.id)
+        index = self._message_list.currentIndex()
+        if index.isValid() and self._model.message_at(index.row()) is message:
+            self._detail_panel.show_message(message)
 
     def _refresh_clicked(self) -> None:
         self._summary_label.setText("Refreshing…")
-        self._controller.refresh_inbox_async(self._on_inbox_refreshed)
+        self._controller.refresh_inbox_async(self._on_inbox_refreshed, on_progress=self._on_inbox_progress)
 
 
 __all__ = ["MainWindow"]
@@ -1,30 +1,106 @@
 """Qt models used by the UI."""
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List, Sequence
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Sequence
 
 from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtGui import QFont
 
 from ..core.mail_client import MailMessage
+from ..core.message_table import MessageTable
+from ..core.store import MessageKey, message_key
+
+# (before, limit, callback) -> None; delivers a MessageTable page or an exception to ``callback`` later.
+PageFetcher = Callable[[MessageKey, int, Callable], None]
+# (message ids, callback) -> None; delivers ``{id: preview}`` or an exception to ``callback`` later.
+PreviewFetcher = Callable[[Sequence[str], Callable], None]
 
 
 class MessageListModel(QAbstractListModel):
-    """Represent mailbox messages in a list view."""
+    """Represent mailbox messages in a list view.
+
+    The first rows are the live inbox kept current by :meth:`update_messages`.
+    Older mail follows in pages fetched through ``canFetchMore``/``fetchMore``
+    as the user scrolls. Those rows live in one :class:`MessageTable`, which
+    keeps a long history in a few dozen bytes per row; only rows recently
+    shown exist as :class:`MailMessage` objects, and their flag changes are
+    written back to the table. Previews the table no longer holds are
+    fetched in the background; such rows show none until they arrive.
+    """
 
     HEADERS = ["From", "Subject", "Preview", "Date", "Flags"]
+    PAGE_SIZE = 50
+    MATERIALIZED_ROWS = 256
+    RETRY_DELAY = 10.0
+    _fonts: dict[tuple[bool, bool], QFont] = {}
 
     def __init__(self) -> None:
         super().__init__()
         self._messages: List[MailMessage] = []
+        # What each row looked like when last shown, to detect in-place changes.
+        self._signatures: List[tuple] = []
+        # Older rows below the live ones, their upper bound and where the next page starts.
+        self._archive: MessageTable | None = None
+        self._floor: MessageKey | None = None
+        self._cursor: MessageKey | None = None
+        # Archive row -> the object handed out for it, least recently used first.
+        self._materialized: OrderedDict[int, MailMessage] = OrderedDict()
+        self._fetch_page: PageFetcher | None = None
+        self._fetch_previews: PreviewFetcher | None = None
+        # Preview blocks of the archive being fetched.
+        self._preview_requests: set[int] = set()
+        self._paging = True
+        self._fetching = False
+        self._exhausted = False
+        self._retry_at = 0.0
+        self._generation = 0
+
+    def set_page_source(self, fetch_page: PageFetcher, fetch_previews: PreviewFetcher | None = None) -> None:
+        """Enable paging older mail in below the live rows.
+
+        Without ``fetch_previews`` previews the pages no longer hold are read
+        on the calling thread.
+        """
+        self._fetch_page = fetch_page
+        self._fetch_previews = fetch_previews
+
+    def set_paging(self, enabled: bool) -> None:
+        """Turn paging on or off; turning it off drops the older pages (e.g. while showing search hits)."""
+        self._paging = enabled
+        if not enabled:
+            self._drop_pages()
 
     def rowCount(self, parent: QModelIndex | None = None) -> int:  # noqa: N802
-        return 0 if parent and parent.isValid() else len(self._messages)
+        if parent and parent.isValid():
+            return 0
+        return len(self._messages) + self._archive_rows()
+
+    def canFetchMore(self, parent: QModelIndex | None = None) -> bool:  # noqa: N802
+        if parent is not None and parent.isValid():
+            return False
+        if not self._paging or self._fetch_page is None or self._fetching or self._exhausted:
+            return False
+        return (bool(self._messages) or self._cursor is not None) and time.monotonic() >= self._retry_at
+
+    def fetchMore(self, parent: QModelIndex | None = None) -> None:  # noqa: N802
+        if not self.canFetchMore(parent):
+            return
+        if self._cursor is not None:
+            before = self._cursor
+        else:
+            before = min(message_key(message) for message in self._messages)
+        self._fetching = True
+        generation = self._generation
+        self._fetch_page(before, self.PAGE_SIZE, lambda result: self._on_page_fetched(generation, before, result))
 
     def data(self, index: QModelIndex, role: int = Qt.DisplayRole):  # noqa: N802
         if not index.isValid():
             return None
-        message = self._messages[index.row()]
+        message = self.message_at(index.row())
+        if message is None:
+            return None
         if role == Qt.DisplayRole:
             return self._format_message(message)
         if role == Qt.DecorationRole:
@@ -32,12 +108,9 @@ class MessageListModel(QAbstractListModel):
         if role == Qt.UserRole:
             return message
         if role == Qt.FontRole:
-            from PySide6.QtGui import QFont
-
-            font = QFont()
-            font.setPointSize(12)
-            font.setBold(message.is_unread)
-            return font
+            return self._font(message.is_unread, message.spam_pending)
+        if role == Qt.ToolTipRole and message.spam_pending:
+            return "Checking whether this is spam…"
         return None
 
     def roleNames(self) -> dict[int, bytes]:  # noqa: N802
@@ -48,14 +121,260 @@ class MessageListModel(QAbstractListModel):
     def set_messages(self, messages: Sequence[MailMessage]) -> None:
         self.beginResetModel()
         self._messages = list(messages)
+        self._signatures = [self._signature(message) for message in self._messages]
+        self._forget_pages()
         self.endResetModel()
 
+    def update_messages(self, messages: Sequence[MailMessage]) -> None:
+        """Bring the rows in line with ``messages`` using minimal row operations.
+
+        Rows are matched by message id: ids that disappeared are removed, new
+        ids inserted, reordered ones moved and changed ones reported through
+        ``dataChanged``. Unlike :meth:`set_messages` this keeps the selection
+        and scroll position and only makes the view relayout touched rows.
+        """
+        target: list[MailMessage] = []
+        wanted: set[str] = set()
+        floor = self._floor
+        for message in messages:
+            if message.id not in wanted and (floor is None or message_key(message) >= floor):
+                wanted.add(message.id)
+                target.append(message)
+        if floor is not None and target:
+            # Rows that slid out of the sync window are still mail; the older pages start below them.
+            newest_gone = min(message_key(message) for message in target)
+            for message in self._messages:
+                if message.id not in wanted and message_key(message) < newest_gone:
+                    wanted.add(message.id)
+                    target.append(message)
+
+        row = len(self._messages) - 1
+        while row >= 0:
+            if self._messages[row].id in wanted:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and self._messages[row].id not in wanted:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, last)
+            del self._messages[row + 1 : last + 1]
+            del self._signatures[row + 1 : last + 1]
+            self.endRemoveRows()
+
+        present = {message.id for message in self._messages}
+        changed: list[int] = []
+        row = 0
+        while row < len(target):
+            message = target[row]
+            if message.id not in present:
+                end = row + 1
+                while end < len(target) and target[end].id not in present:
+                    end += 1
+                self.beginInsertRows(QModelIndex(), row, end - 1)
+                self._messages[row:row] = target[row:end]
+                self._signatures[row:row] = [self._signature(item) for item in target[row:end]]
+                self.endInsertRows()
+                present.update(item.id for item in target[row:end])
+                row = end
+                continue
+            if self._messages[row].id != message.id:
+                source = next(
+                    index for index in range(row + 1, len(self._messages)) if self._messages[index].id == message.id
+                )
+                self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), row)
+                self._messages.insert(row, self._messages.pop(source))
+                self._signatures.insert(row, self._signatures.pop(source))
+                self.endMoveRows()
+            signature = self._signature(message)
+            if signature != self._signatures[row]:
+                changed.append(row)
+            self._messages[row] = message
+            self._signatures[row] = signature
+            row += 1
+
+        self._emit_changed(changed)
+
+    def add_messages(self, messages: Sequence[MailMessage]) -> None:
+        """Insert messages not yet shown, keeping newest-first order."""
+        known = {message.id for message in self._messages}
+        floor = self._floor
+        for message in sorted(messages, key=lambda msg: msg.date_received, reverse=True):
+            if message.id in known or (floor is not None and message_key(message) < floor):
+                continue
+            row = 0
+            while row < len(self._messages) and self._messages[row].date_received > message.date_received:
+                row += 1
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._messages.insert(row, message)
+            self._signatures.insert(row, self._signature(message))
+            self.endInsertRows()
+            known.add(message.id)
+
+    def remove_messages(self, message_ids: Iterable[str]) -> None:
+        """Remove live rows; older pages come from the store, which never holds spam."""
+        doomed = set(message_ids)
+        row = len(self._messages) - 1
+        while row >= 0:
+            if self._messages[row].id not in doomed:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and self._messages[row].id in doomed:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, last)
+            del self._messages[row + 1 : last + 1]
+            del self._signatures[row + 1 : last + 1]
+            self.endRemoveRows()
+
+    def clear_spam_pending(self, message_ids: Iterable[str]) -> None:
+        cleared = set(message_ids)
+        changed: list[int] = []
+        for row, message in enumerate(self._messages):
+            if message.id in cleared and message.spam_pending:
+                message.spam_pending = False
+                self._signatures[row] = self._signature(message)
+                changed.append(row)
+        self._emit_changed(changed)
+
+    def unread_count(self) -> int:
+        return sum(message.is_unread for message in self._messages)
+
     def notify_message_changed(self, row: int) -> None:
         index = self.index(row, 0)
         if index.isValid():
+            if row < len(self._messages):
+                self._signatures[row] = self._signature(self._messages[row])
+            elif row - len(self._messages) in self._materialized:
+                offset = row - len(self._messages)
+                self._archive.update_flags(offset, self._materialized[offset])
             self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.FontRole, Qt.DecorationRole])
-    def message_at(self, row: int) -> MailMessage:
-        return self._messages[row]
+
+    def message_at(self, row: int) -> MailMessage | None:
+        """Message shown in ``row``, or ``None`` past the last row."""
+        if row < len(self._messages):
+            return self._messages[row]
+        offset = row - len(self._messages)
+        if self._archive is None or offset >= len(self._archive):
+            return None
+        message = self._materialized.pop(offset, None)
+        if message is None:
+            message = self._archive.message(offset, load_preview=self._fetch_previews is None)
+            if not message.preview and self._archive.preview(offset, load=False) is None:
+                self._request_previews(offset)
+        self._materialized[offset] = message
+        while len(self._materialized) > self.MATERIALIZED_ROWS:
+            evicted, stale = self._materialized.popitem(last=False)
+            self._archive.update_flags(evicted, stale)
+        return message
+
+    # ------------------------------ paging ---------------------------------
+    def _archive_rows(self) -> int:
+        return len(self._archive) if self._archive is not None else 0
+
+    def _on_page_fetched(self, generation: int, before: MessageKey, result) -> None:
+        if generation != self._generation:
+            return
+        self._fetching = False
+        if isinstance(result, Exception):
+            # Offline or the server is struggling: let the view ask again a little later.
+            self._retry_at = time.monotonic() + self.RETRY_DELAY
+            return
+        if not len(result):
+            self._exhausted = True
+            return
+        self._cursor = result.key(len(result) - 1)
+        known = {message.id for message in self._messages}
+        rows = [row for row in range(len(result)) if result.id(row) not in known]
+        if not rows:
+            return
+        first = self.rowCount()
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        if self._archive is None:
+            self._archive = MessageTable(result.pool, result.preview_loader)
+            self._floor = before
+        self._archive.extend(result, rows)
+        self.endInsertRows()
+
+    def _request_previews(self, offset: int) -> None:
+        number = self._archive.preview_block(offset)
+        if number in self._preview_requests:
+            return
+        message_ids = self._archive.missing_previews(number)
+        if not message_ids:
+            return
+        self._preview_requests.add(number)
+        generation = self._generation
+        self._fetch_previews(message_ids, lambda result: self._on_previews_fetched(generation, number, result))
+
+    def _on_previews_fetched(self, generation: int, number: int, result) -> None:
+        if generation != self._generation:
+            return
+        self._preview_requests.discard(number)
+        if isinstance(result, Exception):
+            return  # painting the rows again asks again
+        self._archive.add_previews(number, result)
+        changed: list[int] = []
+        for offset in self._archive.block_rows(number):
+            message = self._materialized.get(offset)
+            if message is not None and not message.preview:
+                message.preview = self._archive.preview(offset, load=False) or ""
+                changed.append(len(self._messages) + offset)
+        self._emit_changed(changed)
+
+    def _drop_pages(self) -> None:
+        if not self._archive_rows():
+            self._forget_pages()
+            return
+        first = len(self._messages)
+        self.beginRemoveRows(QModelIndex(), first, first + self._archive_rows() - 1)
+        self._forget_pages()
+        self.endRemoveRows()
+
+    def _forget_pages(self) -> None:
+        self._generation += 1
+        self._archive = None
+        self._floor = None
+        self._cursor = None
+        self._materialized.clear()
+        self._preview_requests.clear()
+        self._fetching = False
+        self._exhausted = False
+        self._retry_at = 0.0
+
+    def _emit_changed(self, rows: Iterable[int]) -> None:
+        """Emit one ``dataChanged`` per contiguous run of ``rows``."""
+        ordered = sorted(rows)
+        roles = [Qt.DisplayRole, Qt.FontRole, Qt.DecorationRole, Qt.ToolTipRole]
+        start = 0
+        while start < len(ordered):
+            end = start
+            while end + 1 < len(ordered) and ordered[end + 1] == ordered[end] + 1:
+                end += 1
+            self.dataChanged.emit(self.index(ordered[start], 0), self.index(ordered[end], 0), roles)
+            start = end + 1
+
+    @classmethod
+    def _font(cls, bold: bool, italic: bool) -> QFont:
+        """Shared row font; :class:`~nicemail.ui.delegates.MessageDelegate` paints, this serves other views."""
+        font = cls._fonts.get((bold, italic))
+        if font is None:
+            font = cls._fonts[(bold, italic)] = QFont()
+            font.setPointSize(12)
+            font.setBold(bold)
+            font.setItalic(italic)
+        return font
+
+    @staticmethod
+    def _signature(message: MailMessage) -> tuple:
+        return (
+            message.sender,
+            message.subject,
+            message.preview,
+            message.date_received,
+            message.is_unread,
+            message.is_flagged,
+            message.spam_pending,
+        )
 
     def _format_message(self, message: MailMessage) -> str:
         date_str = message.date_received.strftime("%b %d, %H:%M")
@@ -39,7 +39,7 @@ class MessageDetailPanel(QWidget):
         self._subject.setText(message.subject)
         meta = f"From {message.sender}\nReceived {message.date_received.strftime('%A %d %B %Y %H:%M')}"
         self._meta.setText(meta)
-        self._body.setPlainText(message.preview)
+        self._body.setPlainText(message.body if message.body is not None else message.preview)
 
 
 __all__ = ["MessageDetailPanel"]